@@ -1,3 +1,15 @@
-from .crawler import Crawler
+from typing import TYPE_CHECKING
 
-__all__ = ["Crawler"]
+if TYPE_CHECKING:
+    from .crawler import Crawler, CrawlType
+
+__all__ = ["Crawler", "CrawlType"]
+
+
+def __getattr__(name: str):
+    # crawl4ai pulls in the browser stack, so only import it once a crawler is needed
+    if name in __all__:
+        from . import crawler
+
+        return getattr(crawler, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,83 @@
+import json
+import sqlite3
+import time
+import zlib
+from typing import Optional
+
+
+class CrawlCache:
+    """
+    An SQLite backed store of crawled pages, so repeat crawls from the same
+    starting URL can be served from disk instead of the network.
+
+    :param cache_path: Path to the SQLite database file.
+    """
+
+    def __init__(self, cache_path: str):
+        self._connection = sqlite3.connect(cache_path)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS pages"
+                "(url TEXT PRIMARY KEY, ts INTEGER, markdown BLOB)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS crawls"
+                "(key TEXT PRIMARY KEY, ts INTEGER, urls TEXT)"
+            )
+
+    def __enter__(self) -> "CrawlCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the connection to the database."""
+        self._connection.close()
+
+    def get_crawl(self, key: str) -> Optional[list[tuple[str, Optional[str]]]]:
+        """
+        Load the pages stored for a crawl.
+
+        :param key: Key identifying the crawl.
+        :return: A list of tuples of (url, markdown), or None if the crawl
+            isn't cached.
+        """
+        row = self._connection.execute(
+            "SELECT urls FROM crawls WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+
+        pages = []
+        for url in json.loads(row[0]):
+            page = self._connection.execute(
+                "SELECT markdown FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if page is None:
+                return None
+            markdown = zlib.decompress(page[0]).decode() if page[0] else None
+            pages.append((url, markdown))
+        return pages
+
+    def set_crawl(self, key: str, pages: list[tuple[str, Optional[str]]]) -> None:
+        """
+        Store the pages found by a crawl, replacing any previous entry.
+
+        :param key: Key identifying the crawl.
+        :param pages: A list of tuples of (url, markdown), markdown may be None.
+        """
+        ts = int(time.time())
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?)",
+                [
+                    (url, ts, zlib.compress(markdown.encode()) if markdown else None)
+                    for url, markdown in pages
+                ],
+            )
+            self._connection.execute(
+                "INSERT OR REPLACE INTO crawls VALUES (?, ?, ?)",
+                (key, ts, json.dumps([url for url, _ in pages])),
+            )
@@ -1,5 +1,9 @@
+import asyncio
+import hashlib
+import json
+from contextlib import asynccontextmanager
 from enum import Enum
-from typing import Optional
+from typing import AsyncIterator, Callable, Optional
 
 from crawl4ai import AsyncWebCrawler, CacheMode, CrawlerRunConfig
 from crawl4ai.content_scraping_strategy import LXMLWebScrapingStrategy
@@ -14,12 +18,32 @@ from crawl4ai.deep_crawling.filters import (
 )
 from crawl4ai.deep_crawling.scorers import KeywordRelevanceScorer
 
+from .cache import CrawlCache
+from .utils import clean_url
+
 
 class CrawlType(str, Enum):
     HTML = "html"
     PDF = "pdf"
 
 
+# builds each supported filter from its dictionary configuration
+_FILTER_FACTORIES: dict[str, Callable[[dict], URLFilter]] = {
+    "SEOFilter": lambda f: SEOFilter(
+        threshold=f.get("threshold", 0.6),
+        keywords=f.get("keywords", []),
+    ),
+    "ContentRelevanceFilter": lambda f: ContentRelevanceFilter(
+        query=f.get("query", ""),
+        threshold=f.get("threshold", 0.2),
+    ),
+    "ContentTypeFilter": lambda f: ContentTypeFilter(
+        allowed_types=f.get("allowed_types", ["text/html"])
+    ),
+    "URLPatternFilter": lambda f: URLPatternFilter(patterns=f.get("patterns", [])),
+}
+
+
 class Crawler:
     """
     A class-based implementation of an asynchronous web crawler
@@ -32,6 +56,10 @@ class Crawler:
     :param filters: List of filter configurations or filter instances.
     :param cache_enabled: Whether caching is enabled.
     :param crawl_type: What type of content to crawl for - html or pdf.
+    :param cache_path: Optional path to an SQLite file where crawl results are
+        stored, repeat crawls of the same URL are then read from disk.
+    :param max_concurrent_seeds: Maximum number of starting URLs crawled at
+        once by deep_crawl_many.
     """
 
     def __init__(
@@ -42,6 +70,8 @@ class Crawler:
         filters: Optional[list[dict | URLFilter]] = None,
         cache_enabled: bool = False,
         crawl_type: str = "html",
+        cache_path: Optional[str] = None,
+        max_concurrent_seeds: int = 4,
     ):
         self.max_depth = max_depth
         self.include_external = include_external
@@ -54,40 +84,72 @@ class Crawler:
             raise ValueError(
                 f"Unknown crawl_type option: {crawl_type}. Please choose from {CrawlType._member_names_}"
             )
+        # the cache is opened on first use, and again after the crawler is closed
+        self.cache_path = cache_path
+        self._cache: Optional[CrawlCache] = None
+        # cached crawls are only reused by crawlers with all the same settings,
+        # filter instances are keyed by repr so may miss the cache between runs
+        settings = {
+            "crawl_type": self.crawl_type.value,
+            "max_depth": max_depth,
+            "include_external": include_external,
+            "keyword_scorer": keyword_scorer,
+            "filters": filters,
+        }
+        self._settings_key = hashlib.sha1(
+            json.dumps(settings, sort_keys=True, default=repr).encode()
+        ).hexdigest()
+        self.max_concurrent_seeds = max_concurrent_seeds
+        self._web_crawler: Optional[AsyncWebCrawler] = None
+
+    async def __aenter__(self) -> "Crawler":
+        """Start a browser which is shared by every crawl until exit."""
+        self._web_crawler = AsyncWebCrawler()
+        await self._web_crawler.__aenter__()
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self._web_crawler is not None:
+            await self._web_crawler.__aexit__(*exc_info)
+            self._web_crawler = None
+        self.close()
+
+    def close(self) -> None:
+        """Close the connection to the crawl cache, if one is open."""
+        if self._cache is not None:
+            self._cache.close()
+            self._cache = None
+
+    def _get_cache(self) -> Optional[CrawlCache]:
+        """Return the crawl cache, opening it if a cache path is set."""
+        if self._cache is None and self.cache_path:
+            self._cache = CrawlCache(self.cache_path)
+        return self._cache
+
+    @asynccontextmanager
+    async def _get_web_crawler(self) -> AsyncIterator[AsyncWebCrawler]:
+        """Yield the shared browser if one is running, otherwise a new one."""
+        if self._web_crawler is not None:
+            yield self._web_crawler
+        else:
+            async with AsyncWebCrawler() as crawler:
+                yield crawler
 
     def _initialize_filters(self, filters) -> FilterChain:
         """Converts filter dictionaries into filter objects."""
         filter_list = []
-        if filters:
-            for f in filters:
-                if isinstance(f, dict):
-                    filter_type = f.get("type")
-                    if filter_type == "SEOFilter":
-                        filter_list.append(
-                            SEOFilter(
-                                threshold=f.get("threshold", 0.6),
-                                keywords=f.get("keywords", []),
-                            )
-                        )
-                    elif filter_type == "ContentRelevanceFilter":
-                        filter_list.append(
-                            ContentRelevanceFilter(
-                                query=f.get("query", ""),
-                                threshold=f.get("threshold", 0.2),
-                            )
-                        )
-                    elif filter_type == "ContentTypeFilter":
-                        filter_list.append(
-                            ContentTypeFilter(
-                                allowed_types=f.get("allowed_types", ["text/html"])
-                            )
-                        )
-                    elif filter_type == "URLPatternFilter":
-                        filter_list.append(
-                            URLPatternFilter(patterns=f.get("patterns", []))
-                        )
-                elif isinstance(f, object):
-                    filter_list.append(f)
+        for f in filters or ():
+            if isinstance(f, dict):
+                filter_type = f.get("type")
+                try:
+                    filter_factory = _FILTER_FACTORIES[filter_type]
+                except KeyError:
+                    raise ValueError(
+                        f"Unknown filter type: {filter_type}. Please choose from {list(_FILTER_FACTORIES)}"
+                    )
+                filter_list.append(filter_factory(f))
+            else:
+                filter_list.append(f)
 
         return FilterChain(filter_list)
 
@@ -108,6 +170,36 @@ class Crawler:
 
         :return: A list of tuples of (url, markdown)
         """
+        crawl_key = f"{self._settings_key}:{clean_url(url)}"
+        cache = self._get_cache()
+        if cache is not None:
+            cached_pages = cache.get_crawl(crawl_key)
+            if cached_pages is not None:
+                print(f"Loaded {len(cached_pages)} cached pages")
+                if self.crawl_type == CrawlType.PDF:
+                    return [page_url for page_url, _ in cached_pages]
+                return cached_pages
+
+        crawl_data = [page async for page in self.stream_crawl(url)]
+        print(f"Crawled {len(crawl_data)} pages in total")
+
+        if cache is not None:
+            if self.crawl_type == CrawlType.PDF:
+                cache.set_crawl(crawl_key, [(u, None) for u in crawl_data])
+            else:
+                cache.set_crawl(crawl_key, crawl_data)
+
+        return crawl_data
+
+    async def stream_crawl(self, url: str) -> AsyncIterator[tuple[str, str]]:
+        """
+        Performs a deep crawl on the given URL, yielding each page as soon as
+        it has been crawled rather than waiting for the whole crawl.
+
+        :param url: The starting URL.
+
+        :return: An async iterator of tuples of (url, markdown)
+        """
         # Create crawler configuration
         config = CrawlerRunConfig(
             deep_crawl_strategy=BestFirstCrawlingStrategy(
@@ -118,25 +210,52 @@ class Crawler:
             ),
             scraping_strategy=LXMLWebScrapingStrategy(),
             cache_mode=CacheMode.ENABLED if self.cache_enabled else CacheMode.BYPASS,
+            stream=True,
             verbose=False,
         )
 
-        crawl_data = []
+        # variants of the same page (eg. http/https, #fragments) are only kept once
+        seen_urls: set[str] = set()
 
         # Run the crawler
-        async with AsyncWebCrawler() as crawler:
-            results = await crawler.arun(url, config=config)
-            print(f"Crawled {len(results)} pages in total")
-
-            for result in results:
+        async with self._get_web_crawler() as crawler:
+            async for result in await crawler.arun(url, config=config):
                 if result.success:
+                    url_key = clean_url(result.url)
+                    if url_key in seen_urls:
+                        continue
+                    seen_urls.add(url_key)
+
                     content_type = result.response_headers["content-type"]
                     if (
                         self.crawl_type == CrawlType.PDF
                         and "application/pdf" in content_type
                     ):
-                        crawl_data.append(result.url)
+                        yield result.url
                     elif self.crawl_type == CrawlType.HTML:
-                        crawl_data.append((result.url, result.markdown.raw_markdown))
+                        yield (result.url, result.markdown.raw_markdown)
 
-        return crawl_data
+    async def deep_crawl_many(
+        self, urls: list[str]
+    ) -> list[list[tuple[str, str]] | BaseException]:
+        """
+        Performs deep crawls on several URLs concurrently, sharing one browser.
+
+        :param urls: The starting URLs.
+
+        :return: The deep_crawl result for each URL, or the exception raised
+            while crawling it.
+        """
+        if self._web_crawler is None:
+            async with self:
+                return await self.deep_crawl_many(urls)
+
+        semaphore = asyncio.Semaphore(self.max_concurrent_seeds)
+
+        async def crawl_one(url: str) -> list[tuple[str, str]]:
+            async with semaphore:
+                return await self.deep_crawl(url)
+
+        return await asyncio.gather(
+            *(crawl_one(url) for url in urls), return_exceptions=True
+        )
@@ -1,9 +1,23 @@
-def clean_url(url: str):
-    url = url.split("#")[0]
-    url = url.replace("http://", "https://")
-    url = url.replace("www.", "")
+import re
+from functools import lru_cache
+
+_URL_REPLACEMENTS = {
+    "http://": "https://",
+    "www.": "",
     # fix a specific problem in test set
-    url = url.replace("/download?inline", "")
-    url = url.replace("%20", " ")
+    "/download?inline": "",
+    "%20": " ",
+}
+# a trailing #fragment is dropped, everything else is replaced in the same pass
+_URL_PATTERN = re.compile(
+    r"#.*|" + "|".join(map(re.escape, _URL_REPLACEMENTS)), flags=re.DOTALL
+)
+
 
-    return url
+def _replace_url_part(match: re.Match) -> str:
+    return _URL_REPLACEMENTS.get(match.group(0), "")
+
+
+@lru_cache(maxsize=100_000)
+def clean_url(url: str):
+    return _URL_PATTERN.sub(_replace_url_part, url)
@@ -1,5 +1,23 @@
-from .google_map_tiles_extractor import GoogleMapTilesExtractor
-from .google_static_maps_extractor import GoogleStaticMapsExtractor
-from .wms_extractor import WMSExtractor
+import importlib
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .google_map_tiles_extractor import GoogleMapTilesExtractor
+    from .google_static_maps_extractor import GoogleStaticMapsExtractor
+    from .wms_extractor import WMSExtractor
 
 __all__ = ["GoogleMapTilesExtractor", "GoogleStaticMapsExtractor", "WMSExtractor"]
+
+# extractors are only imported on first use so callers don't pay for all three
+_MODMAP = {
+    "GoogleMapTilesExtractor": "google_map_tiles_extractor",
+    "GoogleStaticMapsExtractor": "google_static_maps_extractor",
+    "WMSExtractor": "wms_extractor",
+}
+
+
+def __getattr__(name: str):
+    if name in _MODMAP:
+        module = importlib.import_module(f".{_MODMAP[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,14 +1,27 @@
+import asyncio
+import itertools
 import logging
 import math
 import os
-from dataclasses import asdict
+import threading
+import time
+from urllib.parse import quote
 
-import requests
+import aiohttp
+import numpy as np
 
-from .map_extractor import MapExtractor
+from .map_extractor import IMAGE_CHUNK_SIZE, MapExtractor
 from .map_utils import GoogleTilesMetadata
+from .sessions import create_client_session, create_session
 
 logger = logging.getLogger(__name__)
+# used when the API response doesn't include an expiry time
+DEFAULT_SESSION_TOKEN_TTL = 2 * 60 * 60
+# refresh tokens this long before they expire
+SESSION_TOKEN_EXPIRY_MARGIN = 60
+# responses meaning the session token was rejected and should be refreshed
+SESSION_TOKEN_REJECTED_STATUSES = (401, 403)
+DEFAULT_TILE_HOST = "tile.googleapis.com"
 
 
 class GoogleMapTilesExtractor(MapExtractor):
@@ -16,10 +29,29 @@ class GoogleMapTilesExtractor(MapExtractor):
     Extracts satellite tiles from Google Maps Tile API using x, y coordinates.
 
     :param google_api_key: Google Maps API key for authentication
+    :param hosts: Tile API hosts to spread tile requests across
+    :param manifest_path: Optional SQLite manifest used to avoid downloading the same tile twice
     """
 
-    def __init__(self, google_api_key: str):
+    def __init__(
+        self,
+        google_api_key: str,
+        hosts: list[str] | None = None,
+        manifest_path: str | None = None,
+    ):
+        super().__init__(manifest_path=manifest_path)
         self._google_api_key = google_api_key
+        self._hosts = hosts or [DEFAULT_TILE_HOST]
+        self._host_iter = itertools.cycle(self._hosts)
+        # each host gets its own connection pool
+        self._session = create_session(pool_hosts=len(self._hosts))
+        self._session_token: str | None = None
+        self._session_token_expiry = 0.0
+        self._session_token_lock = threading.Lock()
+        self._tile_url_template = (
+            "https://{host}/v1/2dtiles/{zoom}/{x}/{y}?session={session_token}&key="
+            + quote(google_api_key, safe="")
+        )
 
     def get_xy_coordinates(self, lon: float, lat: float, zoom: int) -> tuple[int, int]:
         """Convert latitude and longitude to x, y tile coordinates."""
@@ -33,49 +65,259 @@ class GoogleMapTilesExtractor(MapExtractor):
         )
         return xtile, ytile
 
+    def get_xy_coordinates_batch(
+        self, lons: np.ndarray, lats: np.ndarray, zoom: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Convert arrays of latitudes and longitudes to x, y tile coordinates."""
+        lons = np.asarray(lons, dtype=np.float64)
+        lat_rad = np.radians(np.asarray(lats, dtype=np.float64))
+        n = 2.0**zoom
+        xtile = ((lons + 180.0) / 360.0 * n).astype(np.int32)
+        ytile = (
+            (1.0 - np.log(np.tan(lat_rad) + 1 / np.cos(lat_rad)) / np.pi) / 2.0 * n
+        ).astype(np.int32)
+        return xtile, ytile
+
+    def get_lonlat_coordinates_batch(
+        self, xtiles: np.ndarray, ytiles: np.ndarray, zoom: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Convert arrays of x, y tile coordinates to the longitude and latitude of each tile's north-west corner."""
+        n = 2.0**zoom
+        lons = np.asarray(xtiles, dtype=np.float64) / n * 360.0 - 180.0
+        lats = np.degrees(
+            np.arctan(np.sinh(np.pi - 2.0 * np.pi * np.asarray(ytiles) / n))
+        )
+        return lons, lats
+
     def get_session_token(self) -> str:
-        """Request and return a new session token from the Google Maps Tile API."""
-        url = f"https://tile.googleapis.com/v1/createSession?key={self._google_api_key}"
+        """
+        Return a session token for the Google Maps Tile API, reusing the cached
+        token until it is close to expiry.
+        """
+        with self._session_token_lock:
+            if self._session_token and time.monotonic() < self._session_token_expiry:
+                return self._session_token
+
+            url = (
+                f"https://{self._hosts[0]}/v1/createSession?key={self._google_api_key}"
+            )
+
+            payload = {"mapType": "satellite"}
+            headers = {"Content-Type": "application/json"}
 
-        payload = {"mapType": "satellite"}
-        headers = {"Content-Type": "application/json"}
+            response = self._session.post(url, json=payload, headers=headers)
+            response_json = response.json()
+            session_token = response_json.get("session", "")
+            if session_token == "":
+                return session_token
 
-        response = requests.post(url, json=payload, headers=headers)
-        session_token = response.json().get("session", "")
-        return session_token
+            # expiry is given as seconds since the epoch
+            try:
+                ttl = float(response_json["expiry"]) - time.time()
+            except (KeyError, TypeError, ValueError):
+                ttl = DEFAULT_SESSION_TOKEN_TTL
+            self._session_token = session_token
+            self._session_token_expiry = (
+                time.monotonic() + ttl - SESSION_TOKEN_EXPIRY_MARGIN
+            )
+            return session_token
+
+    def refresh_session_token(self, stale_token: str) -> str:
+        """
+        Drop a session token the API rejected and return a fresh one. If another
+        thread has already replaced the stale token, the new one is reused.
+        """
+        with self._session_token_lock:
+            if self._session_token == stale_token:
+                self._session_token = None
+                self._session_token_expiry = 0.0
+        return self.get_session_token()
+
+    def get_tile_url(self, zoom: int, x: int, y: int, session_token: str) -> str:
+        """Build the Google Maps Tile API request URL for a tile."""
+        return self._tile_url_template.format(
+            host=next(self._host_iter),
+            zoom=zoom,
+            x=x,
+            y=y,
+            session_token=session_token,
+        )
 
-    def download_image(self, lat: float, lon: float, zoom: int, filename: str) -> None:
+    def download_image(
+        self,
+        lat: float,
+        lon: float,
+        zoom: int,
+        filename: str,
+        overwrite: bool = False,
+    ) -> None:
         """
         Download a satellite tile image from Google Maps Tile API and save it with metadata.
         :param lat: Latitude of the desired location
         :param lon: Longitude of the desired location
         :param zoom: Zoom level for the tile image
         :param filename: File path to save the downloaded image
+        :param overwrite: Download again even if the image and metadata already exist
         :return: None
         """
-        # get image
+        metadata = GoogleTilesMetadata(
+            lat=lat,
+            lon=lon,
+            zoom=zoom,
+            img_size=(256, 256),
+        )
+        if not overwrite and self.is_downloaded(filename, metadata):
+            logger.info(f"Skipping {filename}, already downloaded")
+            return
+
+        # get image, unless the same tile has already been downloaded elsewhere
         x, y = self.get_xy_coordinates(lon, lat, zoom)
-        session_token = self.get_session_token()
+        key = f"tiles:{zoom}:{x}:{y}"
+        if overwrite or not self._link_from_manifest(key, filename):
+            session_token = self.get_session_token()
+            if session_token == "":
+                logger.error(
+                    "Couldn't get session token, please check your API key is correct"
+                )
+                return
+            self._fetch_tile(key, zoom, x, y, session_token, filename)
+
+        # save metadata
+        self.save_metadata(filename, metadata)
+
+    def _fetch_tile(
+        self, key: str, zoom: int, x: int, y: int, session_token: str, filename: str
+    ) -> None:
+        """Download a single tile image to a file."""
+        headers = self._conditional_headers(key)
+        url = self.get_tile_url(zoom, x, y, session_token)
+        res = self._session.get(url, stream=True, headers=headers)
+        if res.status_code in SESSION_TOKEN_REJECTED_STATUSES:
+            # the cached token has been revoked or expired early, retry once
+            res.close()
+            session_token = self.refresh_session_token(session_token)
+            url = self.get_tile_url(zoom, x, y, session_token)
+            res = self._session.get(url, stream=True, headers=headers)
+
+        # save image
+        self._save_response(key, filename, res)
+
+    async def download_images_async(
+        self,
+        coords: list[tuple[float, float]],
+        zoom: int,
+        out_dir: str,
+        max_concurrency: int = 16,
+        overwrite: bool = False,
+    ) -> None:
+        """
+        Download satellite tiles for many locations concurrently and save them with metadata.
+        Images are saved as `{out_dir}/{lat}_{lon}.png`.
+        :param coords: List of (lat, lon) tuples
+        :param zoom: Zoom level for the tile images
+        :param out_dir: Directory to save the downloaded images in
+        :param max_concurrency: Maximum number of tile requests in flight at once
+        :param overwrite: Download again even if the image and metadata already exist
+        :return: None
+        """
+        # one session token is shared by the whole batch
+        session_token = await asyncio.to_thread(self.get_session_token)
         if session_token == "":
             logger.error(
                 "Couldn't get session token, please check your API key is correct"
             )
             return
 
-        url = f"https://tile.googleapis.com/v1/2dtiles/{zoom}/{x}/{y}?session={session_token}&key={self._google_api_key}"
-        res = requests.get(url)
+        lats, lons = np.asarray(coords, dtype=np.float64).reshape(-1, 2).T
+        xtiles, ytiles = self.get_xy_coordinates_batch(lons, lats, zoom)
 
-        # save image
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        with open(filename, "wb") as f_out:
-            f_out.write(res.content)
-            logger.info(f"Saved image at {filename}")
+        # every tile in the batch shares one output directory
+        self._ensure_dir(out_dir)
 
-        # save metadata
+        semaphore = asyncio.Semaphore(max_concurrency)
+        async with create_client_session(max_concurrency) as session:
+            results = await asyncio.gather(
+                *(
+                    self._download_image_async(
+                        session,
+                        semaphore,
+                        session_token,
+                        lat,
+                        lon,
+                        zoom,
+                        int(x),
+                        int(y),
+                        os.path.join(out_dir, f"{lat}_{lon}.png"),
+                        overwrite,
+                    )
+                    for (lat, lon), x, y in zip(coords, xtiles, ytiles)
+                ),
+                return_exceptions=True,
+            )
+
+        for (lat, lon), result in zip(coords, results):
+            if isinstance(result, BaseException):
+                logger.error(f"Failed to download tile at ({lat}, {lon}): {result}")
+
+    async def _download_image_async(
+        self,
+        session: aiohttp.ClientSession,
+        semaphore: asyncio.Semaphore,
+        session_token: str,
+        lat: float,
+        lon: float,
+        zoom: int,
+        x: int,
+        y: int,
+        filename: str,
+        overwrite: bool = False,
+    ) -> None:
+        """Download a single tile within a batch and save it with metadata."""
         metadata = GoogleTilesMetadata(
             lat=lat,
             lon=lon,
             zoom=zoom,
             img_size=(256, 256),
         )
-        self.save_metadata(filename, asdict(metadata))
+        if not overwrite and self.is_downloaded(filename, metadata):
+            logger.info(f"Skipping {filename}, already downloaded")
+            return
+
+        # get image, unless the same tile has already been downloaded elsewhere
+        key = f"tiles:{zoom}:{x}:{y}"
+        if overwrite or not self._link_from_manifest(key, filename):
+            async with semaphore:
+                await self._fetch_tile_async(
+                    session, zoom, x, y, session_token, filename
+                )
+            self._add_to_manifest(key, filename)
+
+        # save metadata
+        await asyncio.to_thread(self.save_metadata, filename, metadata)
+
+    async def _fetch_tile_async(
+        self,
+        session: aiohttp.ClientSession,
+        zoom: int,
+        x: int,
+        y: int,
+        session_token: str,
+        filename: str,
+    ) -> None:
+        """Download a single tile image to a file within a batch."""
+        for attempt in range(2):
+            url = self.get_tile_url(zoom, x, y, session_token)
+            async with session.get(url) as res:
+                if attempt == 0 and res.status in SESSION_TOKEN_REJECTED_STATUSES:
+                    # the shared token has been rejected, refresh it and retry once
+                    session_token = await asyncio.to_thread(
+                        self.refresh_session_token, session_token
+                    )
+                    continue
+                res.raise_for_status()
+
+                # save image
+                await self.save_image_async(
+                    filename, res.content.iter_chunked(IMAGE_CHUNK_SIZE)
+                )
+                return
@@ -1,19 +1,44 @@
+import asyncio
 import logging
+import math
 import os
-from dataclasses import asdict
-from urllib.parse import urlencode
+from urllib.parse import quote
 
-import requests
+import aiohttp
 
-from .map_extractor import MapExtractor
+from .map_extractor import IMAGE_CHUNK_SIZE, MapExtractor
 from .map_utils import GoogleStaticMetadata
+from .sessions import create_client_session, create_session
 
 logger = logging.getLogger(__name__)
+# largest width or height the Static Maps API serves, before scaling
+MAX_IMAGE_SIZE = 640
 
 
 class GoogleStaticMapsExtractor(MapExtractor):
-    def __init__(self, google_api_key: str):
+    def __init__(self, google_api_key: str, manifest_path: str | None = None):
+        super().__init__(manifest_path=manifest_path)
         self._google_api_key = google_api_key
+        self._session = create_session()
+        # query parameters that are the same for every request
+        self._url_suffix = "&maptype=satellite&key=" + quote(google_api_key, safe="")
+
+    def get_url(
+        self, lat: float, lon: float, zoom: int, scale: int, img_size: tuple[int, int]
+    ) -> str:
+        """Build the Google Static Maps API request URL for a satellite image."""
+        return (
+            f"https://maps.googleapis.com/maps/api/staticmap?center={lat},{lon}"
+            f"&zoom={zoom}&size={img_size[0]}x{img_size[1]}&scale={scale}"
+            f"{self._url_suffix}"
+        )
+
+    @staticmethod
+    def _manifest_key(
+        lat: float, lon: float, zoom: int, scale: int, img_size: tuple[int, int]
+    ) -> str:
+        """Key identifying a Static Maps request in the download manifest."""
+        return f"static:{lat:.6f}:{lon:.6f}:{zoom}:{scale}:{img_size[0]}x{img_size[1]}"
 
     def download_image(
         self,
@@ -23,6 +48,7 @@ class GoogleStaticMapsExtractor(MapExtractor):
         scale: int,
         img_size: tuple[int, int],
         filename: str,
+        overwrite: bool = False,
     ) -> None:
         """
         Download a satellite image from Google Static Maps API and save it with metadata.
@@ -32,29 +58,133 @@ class GoogleStaticMapsExtractor(MapExtractor):
         :param scale: Image scale (1 or 2 for normal/high res)
         :param img_size: Tuple representing width and height in pixels
         :param filename: File path to save the downloaded image
+        :param overwrite: Download again even if the image and metadata already exist
         :return: None
         """
-        # get image
-        static_maps_base_url = "https://maps.googleapis.com/maps/api/staticmap?"
-        params = {
-            "center": f"{lat},{lon}",
-            "zoom": zoom,
-            "size": f"{img_size[0]}x{img_size[1]}",
-            "maptype": "satellite",
-            "scale": scale,
-            "key": self._google_api_key,
-        }
-        query_string = urlencode(params)
-        url = f"{static_maps_base_url}{query_string}"
-        res = requests.get(url)
-
-        # save image
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        with open(filename, "wb") as f_out:
-            f_out.write(res.content)
-            logger.info(f"Saved image at {filename}")
+        metadata = GoogleStaticMetadata(
+            lat=lat,
+            lon=lon,
+            zoom=zoom,
+            scale=scale,
+            img_size=img_size,
+        )
+        if not overwrite and self.is_downloaded(filename, metadata):
+            logger.info(f"Skipping {filename}, already downloaded")
+            return
+
+        # get image, unless the same image has already been downloaded elsewhere
+        key = self._manifest_key(lat, lon, zoom, scale, img_size)
+        if overwrite or not self._link_from_manifest(key, filename):
+            url = self.get_url(lat, lon, zoom, scale, img_size)
+            res = self._session.get(
+                url, stream=True, headers=self._conditional_headers(key)
+            )
+
+            # save image
+            self._save_response(key, filename, res)
 
         # save metadata
+        self.save_metadata(filename, metadata)
+
+    def download_region(
+        self,
+        bbox: tuple[float, float, float, float],
+        zoom: int,
+        out_dir: str,
+        scale: int = 2,
+        max_workers: int = 8,
+        overwrite: bool = False,
+    ) -> list[str]:
+        """
+        Download a rectangular region as the fewest Static Maps images that cover it,
+        each saved with metadata as `{out_dir}/{lat}_{lon}.png`.
+        :param bbox: Region as (min lon, min lat, max lon, max lat)
+        :param zoom: Zoom level for the map images
+        :param out_dir: Directory to save the downloaded images in
+        :param scale: Image scale (1 or 2 for normal/high res)
+        :param max_workers: Maximum number of downloads in flight at once
+        :param overwrite: Download again even if the image and metadata already exist
+        :return: List of image file paths covering the region, leaving out any
+            that failed to download
+        """
+        xmin, ymin, xmax, ymax = bbox
+        # work in web mercator pixels at this zoom, with y growing southwards
+        n = 256 * 2.0**zoom
+
+        def to_pixel(lon: float, lat: float) -> tuple[float, float]:
+            lat_rad = math.radians(lat)
+            px = (lon + 180.0) / 360.0 * n
+            py = (
+                (1.0 - math.log(math.tan(lat_rad) + 1 / math.cos(lat_rad)) / math.pi)
+                / 2.0
+                * n
+            )
+            return px, py
+
+        left, top = to_pixel(xmin, ymax)
+        right, bottom = to_pixel(xmax, ymin)
+
+        points = []
+        for y0 in range(math.floor(top), math.ceil(bottom), MAX_IMAGE_SIZE):
+            height = min(MAX_IMAGE_SIZE, math.ceil(bottom) - y0)
+            for x0 in range(math.floor(left), math.ceil(right), MAX_IMAGE_SIZE):
+                width = min(MAX_IMAGE_SIZE, math.ceil(right) - x0)
+                lon = (x0 + width / 2) / n * 360.0 - 180.0
+                lat = math.degrees(
+                    math.atan(math.sinh(math.pi * (1 - 2 * (y0 + height / 2) / n)))
+                )
+                points.append(
+                    dict(
+                        lat=lat,
+                        lon=lon,
+                        zoom=zoom,
+                        scale=scale,
+                        img_size=(width, height),
+                        filename=os.path.join(out_dir, f"{lat}_{lon}.png"),
+                        overwrite=overwrite,
+                    )
+                )
+
+        return self.download_images(points, max_workers=max_workers)
+
+    async def download_images_async(
+        self, points: list[dict], max_concurrency: int = 16
+    ) -> None:
+        """
+        Download many satellite images concurrently and save them with metadata.
+        :param points: List of keyword arguments for each download_image call
+        :param max_concurrency: Maximum number of requests in flight at once
+        :return: None
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        async with create_client_session(max_concurrency) as session:
+            results = await asyncio.gather(
+                *(
+                    self._download_image_async(session, semaphore, **point)
+                    for point in points
+                ),
+                return_exceptions=True,
+            )
+
+        for point, result in zip(points, results):
+            if isinstance(result, BaseException):
+                logger.error(
+                    f"Failed to download image {point.get('filename')}: {result}"
+                )
+
+    async def _download_image_async(
+        self,
+        session: aiohttp.ClientSession,
+        semaphore: asyncio.Semaphore,
+        lat: float,
+        lon: float,
+        zoom: int,
+        scale: int,
+        img_size: tuple[int, int],
+        filename: str,
+        overwrite: bool = False,
+    ) -> None:
+        """Download a single image within a batch and save it with metadata."""
         metadata = GoogleStaticMetadata(
             lat=lat,
             lon=lon,
@@ -62,4 +192,23 @@ class GoogleStaticMapsExtractor(MapExtractor):
             scale=scale,
             img_size=img_size,
         )
-        self.save_metadata(filename, asdict(metadata))
+        if not overwrite and self.is_downloaded(filename, metadata):
+            logger.info(f"Skipping {filename}, already downloaded")
+            return
+
+        # get image, unless the same image has already been downloaded elsewhere
+        key = self._manifest_key(lat, lon, zoom, scale, img_size)
+        if overwrite or not self._link_from_manifest(key, filename):
+            url = self.get_url(lat, lon, zoom, scale, img_size)
+            async with semaphore:
+                async with session.get(url) as res:
+                    res.raise_for_status()
+
+                    # save image
+                    await self.save_image_async(
+                        filename, res.content.iter_chunked(IMAGE_CHUNK_SIZE)
+                    )
+            self._add_to_manifest(key, filename)
+
+        # save metadata
+        await asyncio.to_thread(self.save_metadata, filename, metadata)
@@ -0,0 +1,98 @@
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+
+class TileManifest:
+    """
+    An SQLite backed record of downloaded map images, keyed by what was requested
+    rather than where it was saved, so the same image is only downloaded once
+    across runs.
+
+    :param manifest_path: Path to the SQLite database file.
+    """
+
+    def __init__(self, manifest_path: str):
+        # shared by the extractor's download threads
+        self._connection = sqlite3.connect(manifest_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS tiles"
+                "(key TEXT PRIMARY KEY, path TEXT, size INTEGER, etag TEXT,"
+                " last_modified TEXT)"
+            )
+
+    def close(self) -> None:
+        """Close the connection to the database."""
+        with self._lock:
+            self._connection.close()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Find an existing download of an image.
+
+        :param key: Key identifying the requested image.
+        :return: Path of the downloaded image, or None if it isn't recorded or
+            the file has since been removed or changed.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT path, size FROM tiles WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+
+        path, size = row
+        try:
+            if os.path.getsize(path) != size:
+                return None
+        except OSError:
+            return None
+        return path
+
+    def get_conditional_headers(self, key: str) -> dict[str, str]:
+        """
+        Build headers asking the server to only resend an image if it has changed.
+
+        :param key: Key identifying the requested image.
+        :return: If-None-Match and If-Modified-Since headers for the recorded
+            download, or an empty dict if there is no usable download.
+        """
+        if self.get(key) is None:
+            return {}
+        with self._lock:
+            etag, last_modified = self._connection.execute(
+                "SELECT etag, last_modified FROM tiles WHERE key = ?", (key,)
+            ).fetchone()
+        headers = {}
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    def add(
+        self,
+        key: str,
+        path: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        """
+        Record a downloaded image, replacing any previous entry.
+
+        :param key: Key identifying the requested image.
+        :param path: Path the image was saved to.
+        :param etag: ETag the server returned with the image, if any.
+        :param last_modified: Last-Modified the server returned with the image, if any.
+        """
+        size = os.path.getsize(path)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO tiles (key, path, size, etag, last_modified)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, os.path.abspath(path), size, etag, last_modified),
+            )
@@ -1,15 +1,48 @@
-import json
+import asyncio
 import logging
 import os
+import shutil
+import threading
 from abc import ABC, abstractmethod
-from typing import Tuple
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import IO, Any, AsyncIterable, Iterable, Iterator, Optional, Tuple
+
+import aiofiles
+import orjson
+import requests
+
+from .manifest import TileManifest
+from .map_utils import metadata_filename
 
 logger = logging.getLogger(__name__)
+# size of the chunks image responses are streamed to disk in
+IMAGE_CHUNK_SIZE = 64 * 1024
 
 
 class MapExtractor(ABC):
     """Abstract base class for all map image extractors."""
 
+    def __init__(self, max_workers: int = 8, manifest_path: Optional[str] = None):
+        # output directories already created by this extractor
+        self._known_dirs: set[str] = set()
+        self._known_dirs_lock = threading.Lock()
+        # background downloads started with submit
+        self._max_workers = max_workers
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+        self._pending = threading.BoundedSemaphore(2 * max_workers)
+        # record of downloads shared across runs, if enabled
+        self._manifest = TileManifest(manifest_path) if manifest_path else None
+        # HTTP session kept open between downloads, for extractors that use one
+        self._session: Optional[requests.Session] = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
     @abstractmethod
     def download_image(
         self,
@@ -26,19 +59,249 @@ class MapExtractor(ABC):
         :param lon: Longitude of the desired location
         :param img_size: Tuple representing width and height in pixels
         :param filename: Path to save the downloaded image
+        :param overwrite: Download again even if the image and metadata already exist
         :return: None
         """
         pass
 
-    def save_metadata(self, filename: str, metadata: dict) -> None:
+    def download_images(self, points: list[dict], max_workers: int = 8) -> list[str]:
+        """
+        Download many map images concurrently, each saved with metadata. Failed
+        downloads are logged and left out of the result.
+        :param points: List of keyword arguments for each download_image call
+        :param max_workers: Maximum number of downloads in flight at once
+        :return: Filenames of the images that were saved
+        """
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self.download_image, **point) for point in points
+            ]
+
+        saved = []
+        for point, future in zip(points, futures):
+            exception = future.exception()
+            if exception is not None:
+                logger.error(
+                    f"Failed to download image {point.get('filename')}: {exception}"
+                )
+            else:
+                saved.append(point.get("filename"))
+        return saved
+
+    def submit(self, **kwargs) -> Future:
+        """
+        Queue a download_image call to run in the background. Blocks while too many
+        downloads are already queued, so producers can't run far ahead of the network.
+        :param kwargs: Keyword arguments for download_image
+        :return: Future that completes when the image has been saved
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self._max_workers)
+            executor = self._executor
+
+        self._pending.acquire()
+        try:
+            future = executor.submit(self.download_image, **kwargs)
+        except BaseException:
+            self._pending.release()
+            raise
+        future.add_done_callback(lambda _: self._pending.release())
+        return future
+
+    def close(self) -> None:
+        """
+        Wait for submitted downloads to finish, shut down the background workers and
+        close the manifest and HTTP session.
+        """
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+        if self._manifest is not None:
+            self._manifest.close()
+        if self._session is not None:
+            self._session.close()
+
+    def save_image(self, filename: str, chunks: Iterable[bytes]) -> None:
+        """
+        Save image bytes to a file as they are received.
+        :param filename: Path to save the image
+        :param chunks: Iterable of image byte chunks, e.g. from a streamed response
+        :return: None
+        """
+        self._ensure_dir(os.path.dirname(filename))
+        with self._atomic_open(filename) as f_out:
+            for chunk in chunks:
+                f_out.write(chunk)
+        logger.info(f"Saved image at {filename}")
+
+    async def save_image_async(
+        self, filename: str, chunks: AsyncIterable[bytes]
+    ) -> None:
+        """
+        Save image bytes to a file as they are received, without blocking the event loop.
+        :param filename: Path to save the image
+        :param chunks: Async iterable of image byte chunks, e.g. from an aiohttp response
+        :return: None
+        """
+        self._ensure_dir(os.path.dirname(filename))
+        tmp_filename = f"{filename}.tmp"
+        try:
+            async with aiofiles.open(tmp_filename, "wb") as f_out:
+                async for chunk in chunks:
+                    await f_out.write(chunk)
+                await f_out.flush()
+                await asyncio.to_thread(os.fsync, f_out.fileno())
+            os.replace(tmp_filename, filename)
+        except BaseException:
+            self._unlink(tmp_filename)
+            raise
+        logger.info(f"Saved image at {filename}")
+
+    def save_metadata(self, filename: str, metadata: Any) -> None:
         """
         Save the metadata to a JSON file.
         :param filename: Path to save the metadata
-        :param metadata: Metadata dictionary to be saved
+        :param metadata: Metadata dictionary or dataclass to be saved
         :return: None
         """
-        meta_filename = filename.replace(".png", ".json")
-        os.makedirs(os.path.dirname(meta_filename), exist_ok=True)
-        with open(meta_filename, "w") as f_meta:
-            json.dump(metadata, f_meta)
-            logger.info(f"Saved metadata at {meta_filename}")
+        meta_filename = metadata_filename(filename)
+        self._ensure_dir(os.path.dirname(meta_filename))
+        with self._atomic_open(meta_filename) as f_meta:
+            f_meta.write(self._dump_metadata(metadata))
+        logger.info(f"Saved metadata at {meta_filename}")
+
+    def is_downloaded(self, filename: str, metadata: Any = None) -> bool:
+        """
+        Check whether an image and its metadata have already been saved.
+        :param filename: Path the image is saved at
+        :param metadata: Metadata of the requested image, if given the saved image only
+            counts when it was downloaded for the same request
+        :return: Whether the image can be reused
+        """
+        if not (os.path.isfile(filename) and os.path.getsize(filename) > 0):
+            return False
+        try:
+            with open(metadata_filename(filename), "rb") as f:
+                saved = f.read()
+        except OSError:
+            return False
+        if metadata is None:
+            return True
+        # compare parsed JSON, so key order and tuples versus lists don't matter
+        try:
+            matches = orjson.loads(saved) == orjson.loads(self._dump_metadata(metadata))
+        except orjson.JSONDecodeError:
+            matches = False
+        if not matches:
+            logger.warning(
+                f"{filename} was saved for a different request, downloading again"
+            )
+            return False
+        return True
+
+    def _link_from_manifest(self, key: str, filename: str) -> bool:
+        """
+        Reuse an image already downloaded for the same request, if the manifest has one.
+        :param key: Key identifying the requested image
+        :param filename: Path the image should be available at
+        :return: Whether the image is now available at filename
+        """
+        if self._manifest is None:
+            return False
+        existing = self._manifest.get(key)
+        if existing is None:
+            return False
+        if existing == os.path.abspath(filename):
+            return True
+
+        self._ensure_dir(os.path.dirname(filename))
+        self._unlink(filename)
+        try:
+            os.link(existing, filename)
+        except OSError:
+            # hard links can't cross filesystems
+            shutil.copyfile(existing, filename)
+        logger.info(f"Linked {filename} to previously downloaded {existing}")
+        return True
+
+    def _conditional_headers(self, key: str) -> dict[str, str]:
+        """Headers that let the server skip resending an image already in the manifest."""
+        if self._manifest is None:
+            return {}
+        return self._manifest.get_conditional_headers(key)
+
+    def _save_response(self, key: str, filename: str, res: requests.Response) -> None:
+        """
+        Save a streamed image response and record it in the manifest. A 304 response
+        to a conditional request reuses the copy already in the manifest.
+        :param key: Key identifying the requested image
+        :param filename: Path to save the image
+        :param res: Response to a request made with stream=True
+        :return: None
+        """
+        with res:
+            if res.status_code == 304:
+                if not self._link_from_manifest(key, filename):
+                    raise requests.HTTPError(
+                        f"Image for {filename} not modified, but no previous download was found",
+                        response=res,
+                    )
+                logger.info(f"Image for {filename} is unchanged on the server")
+                return
+
+            res.raise_for_status()
+            self.save_image(filename, res.iter_content(chunk_size=IMAGE_CHUNK_SIZE))
+
+        if self._manifest is not None:
+            self._manifest.add(
+                key,
+                filename,
+                etag=res.headers.get("ETag"),
+                last_modified=res.headers.get("Last-Modified"),
+            )
+
+    def _add_to_manifest(self, key: str, filename: str) -> None:
+        """Record a downloaded image in the manifest, if one is in use."""
+        if self._manifest is not None:
+            self._manifest.add(key, filename)
+
+    @contextmanager
+    def _atomic_open(self, filename: str) -> Iterator[IO[bytes]]:
+        """
+        Open a temporary file for writing that replaces filename once it is fully
+        written and flushed to disk, so an interrupted download never leaves a
+        partial file behind. Replacing also never writes through a hard link.
+        """
+        tmp_filename = f"{filename}.tmp"
+        try:
+            with open(tmp_filename, "wb") as f_out:
+                yield f_out
+                f_out.flush()
+                os.fsync(f_out.fileno())
+            os.replace(tmp_filename, filename)
+        except BaseException:
+            self._unlink(tmp_filename)
+            raise
+
+    @staticmethod
+    def _unlink(filename: str) -> None:
+        """Remove a file if it exists, so writes never go through a hard link."""
+        try:
+            os.unlink(filename)
+        except FileNotFoundError:
+            pass
+
+    def _ensure_dir(self, path: str) -> None:
+        """Create a directory unless this extractor has already done so."""
+        if path in self._known_dirs:
+            return
+        os.makedirs(path, exist_ok=True)
+        with self._known_dirs_lock:
+            self._known_dirs.add(path)
+
+    @staticmethod
+    def _dump_metadata(metadata: Any) -> bytes:
+        """Serialise metadata, a dict or dataclass, to JSON."""
+        return orjson.dumps(metadata)
@@ -1,28 +1,34 @@
 from dataclasses import dataclass, field
+from pathlib import Path
 from typing import Literal
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class BaseMetadata:
     lat: float
     lon: float
     img_size: tuple[int, int]
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class GoogleStaticMetadata(BaseMetadata):
     zoom: int
     scale: int
     type: Literal["static"] = field(default="static")
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class GoogleTilesMetadata(BaseMetadata):
     zoom: int
     type: Literal["tiles"] = field(default="tiles")
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class WMSMetadata(BaseMetadata):
     bbox: tuple[float, float, float, float]
     type: Literal["wms"] = field(default="wms")
+
+
+def metadata_filename(filename: str) -> str:
+    """Return the path of the metadata file saved alongside an image."""
+    return str(Path(filename).with_suffix(".json"))
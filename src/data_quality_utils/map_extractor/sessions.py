@@ -0,0 +1,60 @@
+import logging
+
+import aiohttp
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+class LoggingRetry(Retry):
+    """Retry policy that logs when the map API is throttling requests."""
+
+    def increment(self, method=None, url=None, response=None, *args, **kwargs):
+        if response is not None and response.status == 429:
+            retry_after = response.headers.get("Retry-After")
+            logger.warning(
+                f"Rate limited by {url}, retrying after "
+                f"{f'{retry_after}s' if retry_after else 'backoff'}"
+            )
+        return super().increment(method, url, response, *args, **kwargs)
+
+
+def create_session(pool_maxsize: int = 32, pool_hosts: int = 1) -> requests.Session:
+    """
+    Create a requests session that keeps connections to the map APIs alive
+    between downloads and retries transient failures and rate limiting.
+    :param pool_maxsize: Maximum number of connections kept open per host
+    :param pool_hosts: Number of hosts to keep a separate connection pool for
+    :return: Configured session
+    """
+    session = requests.Session()
+    retry = LoggingRetry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        # createSession is a POST and safe to repeat
+        allowed_methods={"GET", "POST"},
+        respect_retry_after_header=True,
+    )
+    adapter = HTTPAdapter(
+        pool_connections=pool_hosts, pool_maxsize=pool_maxsize, max_retries=retry
+    )
+    session.mount("https://", adapter)
+    return session
+
+
+def create_client_session(max_concurrency: int = 16) -> aiohttp.ClientSession:
+    """
+    Create an aiohttp session for downloading a batch of map images concurrently.
+    Must be created and closed inside a running event loop.
+    :param max_concurrency: Maximum number of connections open at once
+    :return: Configured session
+    """
+    connector = aiohttp.TCPConnector(
+        limit=max_concurrency, limit_per_host=max_concurrency, ttl_dns_cache=300
+    )
+    return aiohttp.ClientSession(
+        connector=connector, timeout=aiohttp.ClientTimeout(total=30)
+    )
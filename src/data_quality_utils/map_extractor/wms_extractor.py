@@ -1,6 +1,5 @@
 import logging
-import os
-from dataclasses import asdict
+import threading
 
 from owslib.wms import WebMapService
 
@@ -11,8 +10,19 @@ logger = logging.getLogger(__name__)
 
 
 class WMSExtractor(MapExtractor):
-    def __init__(self, wms_url: str):
-        self.wms = WebMapService(wms_url)
+    # parsed GetCapabilities documents, shared by every extractor for the same URL
+    _wms_cache: dict[str, WebMapService] = {}
+    _wms_cache_lock = threading.Lock()
+
+    def __init__(self, wms_url: str, manifest_path: str | None = None):
+        super().__init__(manifest_path=manifest_path)
+        with WMSExtractor._wms_cache_lock:
+            if wms_url not in WMSExtractor._wms_cache:
+                # 1.1.1 keeps the lon/lat axis order used by get_bbox for EPSG:4326
+                WMSExtractor._wms_cache[wms_url] = WebMapService(
+                    wms_url, version="1.1.1", parse_remote_metadata=False
+                )
+            self.wms = WMSExtractor._wms_cache[wms_url]
 
     def get_bbox(
         self, lat: float, lon: float, offset: float
@@ -31,6 +41,7 @@ class WMSExtractor(MapExtractor):
         offset: float,
         filename: str,
         img_size: tuple[int, int] = (500, 500),
+        overwrite: bool = False,
     ) -> None:
         """
         Download a WMS image around the given coordinates and save it with metadata.
@@ -39,29 +50,65 @@ class WMSExtractor(MapExtractor):
         :param offset: Offset in degrees to calculate bounding box
         :param filename: File path to save the image
         :param img_size: Tuple representing width and height in pixels
+        :param overwrite: Download again even if the image and metadata already exist
         :return: None
         """
-        # get image
         bbox = self.get_bbox(lat, lon, offset)
-        img = self.wms.getmap(
-            layers=["APGB_Latest_UK_125mm"],
-            srs="EPSG:4326",
-            bbox=bbox,
-            size=img_size,
-            format="image/png",
-        )
+        self._download_bbox(bbox, lat, lon, filename, img_size, overwrite)
 
-        # save image
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        with open(filename, "wb") as f_out:
-            f_out.write(img.read())
-            logger.info(f"Saved image at {filename}")
+    def download_region(
+        self,
+        bbox: tuple[float, float, float, float],
+        filename: str,
+        img_size: tuple[int, int] = (500, 500),
+        overwrite: bool = False,
+    ) -> None:
+        """
+        Download a whole region as a single WMS image and save it with metadata.
+        :param bbox: Region as (min lon, min lat, max lon, max lat)
+        :param filename: File path to save the image
+        :param img_size: Tuple representing width and height in pixels
+        :param overwrite: Download again even if the image and metadata already exist
+        :return: None
+        """
+        lat = (bbox[1] + bbox[3]) / 2
+        lon = (bbox[0] + bbox[2]) / 2
+        self._download_bbox(bbox, lat, lon, filename, img_size, overwrite)
 
-        # save metadata
+    def _download_bbox(
+        self,
+        bbox: tuple[float, float, float, float],
+        lat: float,
+        lon: float,
+        filename: str,
+        img_size: tuple[int, int],
+        overwrite: bool,
+    ) -> None:
+        """Download a bounding box and save it with metadata for the given point."""
         metadata = WMSMetadata(
             lat=lat,
             lon=lon,
             bbox=bbox,
             img_size=img_size,
         )
-        self.save_metadata(filename, asdict(metadata))
+        if not overwrite and self.is_downloaded(filename, metadata):
+            logger.info(f"Skipping {filename}, already downloaded")
+            return
+
+        # get image, unless the same region has already been downloaded elsewhere
+        key = f"wms:{self.wms.url}:{bbox}:{img_size[0]}x{img_size[1]}"
+        if overwrite or not self._link_from_manifest(key, filename):
+            img = self.wms.getmap(
+                layers=["APGB_Latest_UK_125mm"],
+                srs="EPSG:4326",
+                bbox=bbox,
+                size=img_size,
+                format="image/png",
+            )
+
+            # save image
+            self.save_image(filename, [img.read()])
+            self._add_to_manifest(key, filename)
+
+        # save metadata
+        self.save_metadata(filename, metadata)
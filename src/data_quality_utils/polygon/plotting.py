@@ -2,38 +2,32 @@ from typing import Any
 
 import numpy as np
 import plotly.graph_objects as go
-from shapely import LineString, MultiLineString, MultiPolygon
+import shapely
+from shapely import MultiPolygon
 
 
 def extract_coordinates(
     multi_polygon: MultiPolygon,
+    simplify_tolerance: float = 0.0,
 ) -> tuple[list[float | None], list[float | None]]:
     """Prepares polygons for plotting.
 
     :param polygon: MultiPolygon to plot.
+    :param simplify_tolerance: Distance (degrees) vertices can move when simplifying
+        outlines before plotting, defaults to 0.0, no simplification.
     :return: Two lists of co-ordinates to plot.
     """
-    # Need to convert from crs to co-ords for this plotly method
-    lons: list[float | None] = []
-    lats: list[float | None] = []
-
-    for poly in multi_polygon.geoms:
-        boundary = poly.boundary
-        if isinstance(boundary, MultiLineString):
-            single_boundary = boundary.geoms[0]
-            x_coords, y_coords = single_boundary.coords.xy
-            lon, lat = x_coords, y_coords
-            lons += list(lon)
-            lats += list(lat)
-            lons.append(None)
-            lats.append(None)
-        elif isinstance(boundary, LineString):
-            x_coords, y_coords = boundary.coords.xy
-            lon, lat = x_coords, y_coords
-            lons += list(lon)
-            lats += list(lat)
-            lons.append(None)
-            lats.append(None)
+    if simplify_tolerance > 0:
+        multi_polygon = shapely.simplify(
+            multi_polygon, simplify_tolerance, preserve_topology=True
+        )
+    # Need to convert from crs to co-ords for this plotly method. Only the outer
+    # ring of each polygon is drawn, with a None after each to break the line.
+    exteriors = shapely.get_exterior_ring(shapely.get_parts(multi_polygon))
+    coords = shapely.get_coordinates(exteriors).astype(object)
+    ring_ends = np.cumsum(shapely.get_num_coordinates(exteriors))
+    lons = np.insert(coords[:, 0], ring_ends, None).tolist()
+    lats = np.insert(coords[:, 1], ring_ends, None).tolist()
 
     return lons, lats
 
@@ -49,20 +43,17 @@ def _make_slider_steps(
     :param n_steps: Number of alpha values to include, defaults to 11
     :return: Config dict for slider.
     """
+    color_prefix = f"rgba({base_color[0]}, {base_color[1]}, {base_color[2]}, "
     return [
         dict(
             method="restyle",
             args=[
-                {
-                    "fillcolor": [
-                        f"rgba({base_color[0]}, {base_color[1]}, {base_color[2]}, {alpha_step:.2f})"
-                    ]
-                },
+                {"fillcolor": [f"{color_prefix}{alpha_step:.2f})"]},
                 [slider_index],
             ],
             label=f"{alpha_step*100:.0f}%",
         )
-        for alpha_step in np.linspace(0, 1, n_steps)
+        for alpha_step in np.linspace(0, 1, n_steps).tolist()
     ]
 
 
@@ -74,6 +65,7 @@ def plot_multipolygon(
     fill_alpha: None | float = 0.3,
     line_color: str = "black",
     line_width: int = 1,
+    simplify_tolerance: float = 0.0,
 ) -> go.Figure:
     """Plot a (Multi)polygon on a plotly figure.
 
@@ -84,9 +76,12 @@ def plot_multipolygon(
     :param fill_alpha: Optional opacity if filling polygon, defaults to 0.3
     :param line_color: Outline colour for polygon, defaults to "black"
     :param line_width: Width of polygon outline, defaults to 1
+    :param simplify_tolerance: Distance (degrees) vertices can move when simplifying
+        the outline, fewer vertices keep large polygons responsive, defaults to 0.0,
+        no simplification.
     :return: modified figure
     """
-    lons, lats = extract_coordinates(polygon)
+    lons, lats = extract_coordinates(polygon, simplify_tolerance)
 
     if fill_color:
         fill_color_str = (
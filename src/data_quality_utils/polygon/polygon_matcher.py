@@ -1,12 +1,100 @@
+import hashlib
+import json
+import os
+from functools import lru_cache
+from typing import TypeVar
+
 import geopandas as gpd
+import numpy as np
 import osmnx as ox
+import pyogrio
+import shapely
 from brdr.aligner import Aligner
 from brdr.enums import OpenbaarDomeinStrategy
 from brdr.loader import DictLoader
 from geopandas import GeoDataFrame, GeoSeries
+from pyproj import CRS, Transformer
 from shapely import MultiPolygon, Polygon
-from shapely.ops import unary_union
-from shapely.validation import make_valid
+from shapely.errors import GEOSException
+from shapely.geometry.base import BaseGeometry
+
+GeoFrameOrSeries = TypeVar("GeoFrameOrSeries", GeoDataFrame, GeoSeries)
+
+
+@lru_cache(maxsize=16)
+def _transformer(from_crs: CRS | str, to_crs: CRS | str) -> Transformer:
+    """Transformer between two CRS, created once per pair.
+
+    :param from_crs: Co-ordinate reference system to project from.
+    :param to_crs: Co-ordinate reference system to project to.
+    :return: Transformer taking and returning x, y order co-ordinates.
+    """
+    return Transformer.from_crs(from_crs, to_crs, always_xy=True)
+
+
+def _project(geometries, from_crs: CRS | str, to_crs: CRS | str):
+    """Reprojects a geometry or array of geometries, passing all their co-ordinates
+    to PROJ in one call.
+
+    :param geometries: Geometry or array of geometries to reproject.
+    :param from_crs: Co-ordinate reference system to project from.
+    :param to_crs: Co-ordinate reference system to project to.
+    :return: Reprojected geometry or array of geometries.
+    """
+    transformer = _transformer(from_crs, to_crs)
+
+    def transform_coords(coords: np.ndarray) -> np.ndarray:
+        return np.column_stack(transformer.transform(coords[:, 0], coords[:, 1]))
+
+    return shapely.transform(geometries, transform_coords)
+
+
+def _to_crs(df: GeoFrameOrSeries, crs: str) -> GeoFrameOrSeries:
+    """Reprojects geometries, skipping the copy when they're already in that CRS.
+
+    :param df: GeoDataFrame or GeoSeries to reproject.
+    :param crs: Co-ordinate reference system to project to.
+    :return: Geometries in the requested CRS.
+    """
+    if df.crs == crs:
+        return df
+    if df.crs is None:
+        # let geopandas raise its usual error for naive geometries
+        return df.to_crs(crs)
+
+    geometries = _project(df.geometry.to_numpy(), df.crs, crs)
+    reprojected = GeoSeries(geometries, index=df.index, crs=crs, name=df.geometry.name)
+    if isinstance(df, GeoSeries):
+        return reprojected
+    return df.set_geometry(reprojected)
+
+
+def _geometry_key(df: GeoDataFrame | GeoSeries) -> bytes:
+    """Digest of a frame's geometries and CRS, so cached results are reused for
+    equal geometries and not for frames changed in place.
+
+    :param df: GeoDataFrame or GeoSeries to identify.
+    :return: Digest of the geometries' WKB and the CRS.
+    """
+    digest = hashlib.blake2b(str(df.crs).encode(), digest_size=16)
+    for wkb in shapely.to_wkb(df.geometry.to_numpy()):
+        digest.update(wkb if wkb is not None else b"\0")
+    return digest.digest()
+
+
+def _repair_invalid(geometries: np.ndarray) -> np.ndarray:
+    """Repairs invalid geometries with a zero buffer. make_valid isn't used as it
+    can turn polygons into collections.
+
+    :param geometries: Array of geometries.
+    :return: The same array when every geometry is valid, otherwise a repaired copy.
+    """
+    invalid = ~shapely.is_valid(geometries)
+    if not invalid.any():
+        return geometries
+    geometries = geometries.copy()
+    geometries[invalid] = shapely.buffer(geometries[invalid], 0)
+    return geometries
 
 
 class PolygonMatcher:
@@ -22,6 +110,8 @@ class PolygonMatcher:
     :param mercator_crs: Co-ordinate reference system for mercator projection. Used for Brdr and distances.
     :param polygon_detection_buffer: Radius of buffer around our boundary (m) for polygons to consider snapping to.
     :param line_buffer: Radius of small buffer to expand linestring objects to be considered polygons
+    :param osm_cache_dir: Directory to keep downloaded Open Street Map features in, so later runs
+        can read them back instead of querying again. Defaults to None, keeping them in memory only.
     """
 
     def __init__(
@@ -33,6 +123,7 @@ class PolygonMatcher:
         mercator_crs: str = "EPSG:3857",
         polygon_detection_buffer: float = 1.0,
         line_buffer: float = 5.0,
+        osm_cache_dir: str | None = None,
     ):
         self.base_crs = base_crs
         self.polygon_snap_distance = polygon_snap_distance
@@ -42,6 +133,140 @@ class PolygonMatcher:
         self.base_crs = base_crs
         self.polygon_detection_buffer = polygon_detection_buffer
         self.line_buffer = line_buffer
+        self.osm_cache_dir = osm_cache_dir
+        # OSM query polygons keyed by original boundary, and the features
+        # downloaded for each query polygon along with the tags queried
+        self._query_polygon_cache: dict[bytes, Polygon | MultiPolygon] = {}
+        self._osm_cache: dict[bytes, list[tuple[dict, GeoDataFrame]]] = {}
+        # spatial index over the most recent base features, kept with a digest
+        # of their geometries so it's only reused for equal geometries
+        self._base_features_index: tuple[bytes, np.ndarray, shapely.STRtree] | None = (
+            None
+        )
+        self._base_features_union: tuple[bytes, BaseGeometry] | None = None
+        # areas of concern for the most recent base features and diff
+        self._discrepancy_areas_cache: tuple[bytes, bytes, np.ndarray] | None = None
+        # mercator projections of recent inputs, keyed by their geometries
+        self._mercator_cache: dict[bytes, GeoDataFrame | GeoSeries] = {}
+
+    def _to_mercator(self, df: GeoFrameOrSeries) -> GeoFrameOrSeries:
+        """Projects geometries to the mercator CRS, reusing the projection of equal
+        geometries. Geometries without a CRS are taken to be in it already.
+
+        :param df: GeoDataFrame or GeoSeries to project.
+        :return: Geometries in the mercator CRS.
+        """
+        if df.crs is None or df.crs == self.mercator_crs:
+            return df
+        key = _geometry_key(df)
+        if key not in self._mercator_cache:
+            if len(self._mercator_cache) >= 4:
+                del self._mercator_cache[next(iter(self._mercator_cache))]
+            self._mercator_cache[key] = _to_crs(df, self.mercator_crs)
+        return self._mercator_cache[key]
+
+    def _query_polygon(self, original_df: GeoDataFrame) -> Polygon | MultiPolygon:
+        """Buffered outline of the original border used to query Open Street Map.
+
+        :param original_df: Dataframe with original area polygon.
+        :return: Query polygon in the base CRS.
+        """
+        key = original_df.geometry.iloc[0].wkb + str(original_df.crs).encode()
+        if key not in self._query_polygon_cache:
+            original_geom = _to_crs(
+                original_df.geometry.iloc[:1], self.mercator_crs
+            ).iloc[0]
+            # Only one geometry, so shapely is called directly rather than through GeoSeries
+            added_buffer_geom = shapely.buffer(
+                shapely.boundary(original_geom),
+                self.polygon_detection_buffer,
+                quad_segs=16,
+            )
+            self._query_polygon_cache[key] = _project(
+                added_buffer_geom, self.mercator_crs, self.base_crs
+            )
+        return self._query_polygon_cache[key]
+
+    def _download_osm_features(
+        self, original_df: GeoDataFrame, tags: dict
+    ) -> GeoDataFrame:
+        """Downloads Open Street Map features near the original border, reusing an
+        earlier download when it already covers the requested tags.
+
+        :param original_df: Dataframe with original area polygon.
+        :param tags: Dictionary with Open Street Map tags to download.
+        :return: GeoDataFrame of downloaded features.
+        """
+        polygon_for_osm = self._query_polygon(original_df)
+        cached_downloads = self._osm_cache.setdefault(polygon_for_osm.wkb, [])
+        for cached_tags, cached_features_df in cached_downloads:
+            if cached_tags == tags:
+                return cached_features_df
+            # everything under these tag keys has been downloaded already
+            if all(cached_tags.get(key) is True for key in tags):
+                return self._filter_by_tags(cached_features_df, tags)
+
+        if self.osm_cache_dir is None:
+            downloaded_features_df = ox.features_from_polygon(polygon_for_osm, tags)
+        else:
+            downloaded_features_df = self._read_or_download_osm_features(
+                polygon_for_osm, tags
+            )
+        cached_downloads.append((tags, downloaded_features_df))
+        return downloaded_features_df
+
+    def _read_or_download_osm_features(
+        self, polygon_for_osm: Polygon | MultiPolygon, tags: dict
+    ) -> GeoDataFrame:
+        """Reads Open Street Map features saved by an earlier run, downloading and
+        saving them if there are none.
+
+        :param polygon_for_osm: Query polygon in the base CRS.
+        :param tags: Dictionary with Open Street Map tags to download.
+        :return: GeoDataFrame of downloaded features.
+        """
+        key = hashlib.sha1(
+            polygon_for_osm.wkb + json.dumps(tags, sort_keys=True).encode()
+        ).hexdigest()
+        path = os.path.join(self.osm_cache_dir, f"{key}.gpkg")
+        if os.path.exists(path):
+            # pyogrio reads whole columns at once rather than record by record
+            return pyogrio.read_dataframe(path)
+
+        downloaded_features_df = ox.features_from_polygon(polygon_for_osm, tags)
+        # Only the tag columns are kept, lists of member nodes and ways can't be saved
+        list_columns = [
+            column
+            for column in downloaded_features_df.columns
+            if downloaded_features_df[column].dtype == object
+            and downloaded_features_df[column].map(lambda v: isinstance(v, list)).any()
+        ]
+        os.makedirs(self.osm_cache_dir, exist_ok=True)
+        pyogrio.write_dataframe(
+            downloaded_features_df.drop(columns=list_columns).reset_index(drop=True),
+            path,
+        )
+        return downloaded_features_df
+
+    @staticmethod
+    def _filter_by_tags(features_df: GeoDataFrame, tags: dict) -> GeoDataFrame:
+        """Selects the features matching any of the tags, as an Open Street Map query would.
+
+        :param features_df: GeoDataFrame of Open Street Map features.
+        :param tags: Dictionary with Open Street Map tags to match.
+        :return: GeoDataFrame of matching features.
+        """
+        mask = np.zeros(len(features_df), dtype=bool)
+        for key, value in tags.items():
+            if key not in features_df.columns:
+                continue
+            if value is True:
+                mask |= features_df[key].notna().to_numpy()
+            elif isinstance(value, str):
+                mask |= (features_df[key] == value).to_numpy()
+            else:
+                mask |= features_df[key].isin(value).to_numpy()
+        return features_df[mask]
 
     def find_near_tags(
         self, original_df: GeoDataFrame, tag_keys: list[str] = ["landuse", "natural"]
@@ -56,16 +281,11 @@ class PolygonMatcher:
         :return: Dictionary of tags formatted for use in download_osm_polygons.
         """
         nearby_tags = dict()
-        added_buffer_df = original_df.to_crs(self.mercator_crs).boundary.buffer(
-            self.polygon_detection_buffer
-        )
-        df_for_query = added_buffer_df.to_crs(self.base_crs)
-        polygon_for_osm = df_for_query.geometry.iloc[0]
         query_all_tags: dict[str, bool | str | list[str]] = {
             feature: True for feature in tag_keys
         }
-        downloaded_features_df = ox.features_from_polygon(
-            polygon_for_osm, query_all_tags
+        downloaded_features_df = self._download_osm_features(
+            original_df, query_all_tags
         )
 
         for tag in tag_keys:
@@ -84,34 +304,38 @@ class PolygonMatcher:
         :param feature_tags: Dictionary with Open Street Map tags for which polygon types we wish to consider.
         :return: GeoSeries with all polygons found in our downloading search.
         """
-
-        added_buffer_df = original_df.to_crs(self.mercator_crs).boundary.buffer(
-            self.polygon_detection_buffer
+        # Reuses the download from find_near_tags when it covers these tags.
+        downloaded_features_df = self._download_osm_features(original_df, feature_tags)
+
+        # Only the geometries are needed from here on
+        downloaded_geometries = downloaded_features_df.geometry
+        type_ids = shapely.get_type_id(downloaded_geometries.to_numpy())
+        polygon_or_line_mask = np.isin(
+            type_ids,
+            [
+                shapely.GeometryType.POLYGON,
+                shapely.GeometryType.MULTIPOLYGON,
+                shapely.GeometryType.LINESTRING,
+            ],
         )
-        df_for_query = added_buffer_df.to_crs(self.base_crs)
-        polygon_for_osm = df_for_query.geometry.iloc[0]
-
-        base_features_df = gpd.GeoDataFrame(geometry=[], crs=self.base_crs)
-        downloaded_features_df = ox.features_from_polygon(polygon_for_osm, feature_tags)
+        base_features_df = _to_crs(
+            downloaded_geometries[polygon_or_line_mask], self.mercator_crs
+        )
+        geometries = base_features_df.to_numpy().copy()
 
-        base_features_df = downloaded_features_df[
-            downloaded_features_df.geometry.geom_type.isin(
-                ["Polygon", "MultiPolygon", "LineString"]
-            )
-        ]
         # This ensures that LineStrings are also interpreted as v.small polygons - shortcut for all in one solution.
-        base_features_df = base_features_df.to_crs(self.mercator_crs)
-        linestring_mask = base_features_df["geometry"].geom_type == "LineString"
-        base_features_df.loc[linestring_mask, "geometry"] = base_features_df.loc[
-            linestring_mask, "geometry"
-        ].buffer(self.line_buffer)
-
-        # Buffer of zero is to ensure it is a GeoPandas series, rather than a df with other args.
-        base_features_df = base_features_df.buffer(0)
+        linestring_mask = (
+            type_ids[polygon_or_line_mask] == shapely.GeometryType.LINESTRING
+        )
+        geometries[linestring_mask] = shapely.buffer(
+            geometries[linestring_mask], self.line_buffer, quad_segs=16
+        )
 
-        if base_features_df.crs != self.mercator_crs:
-            return base_features_df.to_crs(self.mercator_crs)
-        return base_features_df
+        return GeoSeries(
+            _repair_invalid(geometries),
+            index=base_features_df.index,
+            crs=self.mercator_crs,
+        )
 
     def _combine_osm_polygons(
         self,
@@ -122,9 +346,8 @@ class PolygonMatcher:
         :param base_features_df: GeoSeries with all the relevant base polygons.
         :return: Combined Polygon or MultiPolygon for base features.
         """
-        geometries_to_combine = base_features_df.geometry
         # Combine all the geometries we need
-        combined_geometries = unary_union(geometries_to_combine)
+        combined_geometries = self._union_base_features(base_features_df)
         if isinstance(combined_geometries, (Polygon | MultiPolygon)):
             return combined_geometries
         else:
@@ -132,22 +355,73 @@ class PolygonMatcher:
                 f"Non MultiPolygon or Polygon type returned by unary_union - type of {type(combined_geometries)}"
             )
 
+    def _union_base_features(self, base_features_df: GeoSeries) -> BaseGeometry:
+        """Unions all base features, reusing the result while the same geometries are passed in.
+
+        :param base_features_df: GeoSeries with all the relevant base polygons.
+        :return: Union of the base features.
+        """
+        key = _geometry_key(base_features_df)
+        if self._base_features_union is None or self._base_features_union[0] != key:
+            self._base_features_union = (
+                key,
+                self._union_geometries(base_features_df.geometry.to_numpy()),
+            )
+        return self._base_features_union[1]
+
+    @staticmethod
+    def _union_geometries(geometries: np.ndarray) -> BaseGeometry:
+        """Unions polygons, only merging shared edges when none of them overlap and
+        their shared edges have matching vertices.
+
+        :param geometries: Array of valid polygons.
+        :return: Union of the polygons.
+        """
+        parts = shapely.get_parts(geometries)
+        tree = shapely.STRtree(parts)
+        first, second = tree.query(parts, predicate="intersects")
+        pairs = first < second
+        # Polygons whose interiors meet need the full overlay
+        if np.any(
+            shapely.relate_pattern(
+                parts[first[pairs]], parts[second[pairs]], "T********"
+            )
+        ):
+            return shapely.union_all(parts)
+        # Coverage union needs edges shared exactly, vertex for vertex. Edges
+        # only partly shared either raise or leave an invalid result, so those
+        # fall back to the full overlay too
+        try:
+            union = shapely.coverage_union_all(parts)
+        except GEOSException:
+            return shapely.union_all(parts)
+        if not shapely.is_valid(union):
+            return shapely.union_all(parts)
+        return union
+
     def _get_snapped_polygon(
         self,
         new_geom: Polygon | MultiPolygon,
         original_projection: GeoDataFrame,
-    ) -> tuple[GeoDataFrame, GeoDataFrame]:
+    ) -> tuple[BaseGeometry, BaseGeometry]:
         """Utilise brdr to obtain a new boundary based on parameters and areas.
 
         :param new_geom: New geometries we want our boundary to consider. These are the base features.
         :param original_projection: The original boundary projected appropriately for this task.
-        :return: tuple with aligned_df containing new boundary and diff_geom for polygons where areas changed.
+        :return: tuple with aligned_geom containing new boundary and diff_geom for polygons where areas changed.
         """
-        aligned_df = None
         original_geom = original_projection["geometry"].iloc[0]
         if not original_geom.is_valid:
             original_geom = original_geom.buffer(0)
 
+        # brdr returns the original boundary unchanged when no base features are
+        # close enough to snap to, so skip the alignment
+        shapely.prepare(original_geom)
+        if new_geom.is_empty or not shapely.dwithin(
+            original_geom, new_geom, self.polygon_snap_distance
+        ):
+            return original_geom, Polygon()
+
         # Alignment logic
         aligner = Aligner(crs=self.mercator_crs)
         original_loader = DictLoader({"theme_id_1": original_geom})
@@ -168,19 +442,11 @@ class PolygonMatcher:
             "result_diff"
         ]
 
-        if not aligned_geom.is_valid:
-            aligned_geom = aligned_geom.buffer(0)
-
-        aligned_df = gpd.GeoDataFrame(
-            [1], geometry=[aligned_geom], crs=self.mercator_crs
+        aligned_geom, diff_geom = _repair_invalid(
+            np.array([aligned_geom, diff_geom], dtype=object)
         )
 
-        if not diff_geom.is_valid:
-            diff_geom = diff_geom.buffer(0)
-
-        diff_df = gpd.GeoDataFrame([1], geometry=[diff_geom], crs=self.mercator_crs)
-
-        return aligned_df, diff_df
+        return aligned_geom, diff_geom
 
     def match_polygon_to_features(
         self,
@@ -195,12 +461,26 @@ class PolygonMatcher:
         :param base_features_df: GeoSeries with base polygon features from Open Street Map.
         :return: tuple with aligned_df containing new boundary and diff_geom for polygons where areas changed.
         """
-        original_projection = original_df.to_crs(self.mercator_crs)
+        original_projection = _to_crs(original_df, self.mercator_crs)
+        # Only invalid features are repaired, so valid ones needn't be
+        # buffered by callers and the same GeoSeries keeps its cached union
+        base_geometries = base_features_df.to_numpy()
+        repaired_geometries = _repair_invalid(base_geometries)
+        if repaired_geometries is not base_geometries:
+            base_features_df = GeoSeries(
+                repaired_geometries,
+                index=base_features_df.index,
+                crs=base_features_df.crs,
+            )
         new_geom = self._combine_osm_polygons(base_features_df)
-        aligned_df, diff_df = self._get_snapped_polygon(
+        aligned_geom, diff_geom = self._get_snapped_polygon(
             new_geom=new_geom,
             original_projection=original_projection,
         )
+        aligned_df = gpd.GeoDataFrame(
+            [1], geometry=[aligned_geom], crs=self.mercator_crs
+        )
+        diff_df = gpd.GeoDataFrame([1], geometry=[diff_geom], crs=self.mercator_crs)
 
         return aligned_df, diff_df
 
@@ -224,22 +504,32 @@ class PolygonMatcher:
         :param diff_df: GeoDataFrame with areas that differ to original boundary.
         :return: Tuple of standardised Polygons/Multipolygons in same order.
         """
-        original_border = original_df["geometry"].to_crs(self.base_crs)[0]
+        original_border = _to_crs(original_df["geometry"], self.base_crs)[0]
 
-        new_border = MultiPolygon(
-            list(aligned_df["geometry"].explode().to_crs(self.base_crs))
+        new_border = shapely.multipolygons(
+            shapely.get_parts(_to_crs(aligned_df["geometry"], self.base_crs).to_numpy())
         )
-        base_features = MultiPolygon(
-            list(base_features_df.explode().to_crs(self.base_crs))
+        base_feature_parts = shapely.get_parts(
+            _to_crs(base_features_df, self.base_crs).to_numpy()
         )
-        difference_area = make_valid(base_features).intersection(
-            diff_df["geometry"].to_crs(self.base_crs)
+        base_features = shapely.multipolygons(base_feature_parts)
+
+        # The areas of concern are found in the mercator CRS, sharing the spatial
+        # index and cached work with the area calculations, and only the clipped
+        # parts are projected back.
+        difference_parts = shapely.get_parts(
+            self._discrepancy_area(
+                self._to_mercator(base_features_df), self._to_mercator(diff_df)
+            )
         )
-        difference_area = difference_area.explode()
-        difference_area = difference_area[
-            difference_area.geometry.geom_type.isin(["Polygon", "MultiPolygon"])
+        difference_parts = difference_parts[
+            shapely.get_type_id(difference_parts) == shapely.GeometryType.POLYGON
         ]
-        difference_area = MultiPolygon(list(difference_area))
+        difference_area = shapely.multipolygons(
+            _to_crs(
+                GeoSeries(difference_parts, crs=self.mercator_crs), self.base_crs
+            ).to_numpy()
+        )
 
         return original_border, base_features, new_border, difference_area
 
@@ -258,21 +548,98 @@ class PolygonMatcher:
         :param bounding_box_threshold: Overlap required to filter out rectangular like objects. If bounding box is too similar
             to polygon, unlikely to be interesting, defaults to 0.5.
         """
-        diff_series = GeoSeries(difference_area).explode()
-        diff_series = diff_series.set_crs("EPSG:4326", allow_override=True).to_crs(
-            "EPSG:3857"
+        diff_parts = shapely.get_parts(difference_area)
+        projected_parts = _to_crs(
+            GeoSeries(diff_parts, crs="EPSG:4326"), "EPSG:3857"
+        ).to_numpy()
+        areas = shapely.area(projected_parts)
+        small_area_mask = areas > area_threshold
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bounding_box_mask = (
+                areas / shapely.area(shapely.minimum_rotated_rectangle(projected_parts))
+                < bounding_box_threshold
+            )
+        thinness_mask = (
+            shapely.area(
+                shapely.buffer(projected_parts, -thinness_buffer, quad_segs=16)
+            )
+            > 0
         )
-        small_area_mask = diff_series.area > area_threshold
-        bounding_box_mask = (
-            diff_series.area / diff_series.minimum_rotated_rectangle().area
-            < bounding_box_threshold
+        # The parts are still in EPSG:4326, so the kept ones needn't be projected back
+        return shapely.multipolygons(
+            diff_parts[small_area_mask & (bounding_box_mask | thinness_mask)]
         )
-        thinness_mask = diff_series.buffer(-thinness_buffer).area > 0
-        filtered_diff_series = diff_series[
-            small_area_mask & (bounding_box_mask | thinness_mask)
-        ]
-        filtered_diff_series = filtered_diff_series.to_crs("EPSG:4326")
-        return MultiPolygon(list(filtered_diff_series))
+
+    def _index_base_features(
+        self, base_features_df: GeoSeries
+    ) -> tuple[np.ndarray, shapely.STRtree]:
+        """Splits base features into valid parts with a spatial index over them,
+        reusing the result while the same geometries are passed in.
+
+        :param base_features_df: GeoSeries with base polygon features from Open Street Map.
+        :return: tuple with array of base feature parts and an STRtree over them.
+        """
+        key = _geometry_key(base_features_df)
+        if self._base_features_index is None or self._base_features_index[0] != key:
+            base_feature_parts = shapely.make_valid(
+                shapely.get_parts(base_features_df.geometry.to_numpy())
+            )
+            self._base_features_index = (
+                key,
+                base_feature_parts,
+                shapely.STRtree(base_feature_parts),
+            )
+        _, base_feature_parts, tree = self._base_features_index
+        return base_feature_parts, tree
+
+    def _discrepancy_area(
+        self,
+        base_features_df: GeoSeries,
+        diff_df: GeoDataFrame,
+    ) -> BaseGeometry:
+        """Finds the areas of concern, where base features fall within areas that
+        differ to the original boundary.
+
+        :param base_features_df: GeoSeries with base polygon features from Open Street Map.
+        :param diff_df: GeoDataFrame with areas that differ to original boundary.
+        :return: Geometry covering all areas of concern.
+        """
+        base_feature_parts, tree = self._index_base_features(base_features_df)
+        diff_parts = shapely.get_parts(diff_df.geometry.to_numpy())
+        shapely.prepare(diff_parts)
+        # Only pairs of diff and feature parts that meet need clipping
+        diff_index, feature_index = tree.query(diff_parts, predicate="intersects")
+        # Clipping each pair first keeps the union small, and counts areas where
+        # features overlap once.
+        red_area = shapely.union_all(
+            shapely.intersection(
+                diff_parts[diff_index], base_feature_parts[feature_index]
+            )
+        )
+        return shapely.make_valid(red_area)
+
+    def _discrepancy_areas(
+        self,
+        base_features_df: GeoSeries,
+        diff_df: GeoDataFrame,
+    ) -> np.ndarray:
+        """Areas of each separate area of concern, reusing the result while the same
+        base feature and diff geometries are passed in.
+
+        :param base_features_df: GeoSeries with base polygon features from Open Street Map.
+        :param diff_df: GeoDataFrame with areas that differ to original boundary.
+        :return: Array of areas.
+        """
+        base_key = _geometry_key(base_features_df)
+        diff_key = _geometry_key(diff_df)
+        if self._discrepancy_areas_cache is None or self._discrepancy_areas_cache[
+            :2
+        ] != (base_key, diff_key):
+            red_areas = shapely.area(
+                shapely.get_parts(self._discrepancy_area(base_features_df, diff_df))
+            )
+            self._discrepancy_areas_cache = (base_key, diff_key, red_areas)
+        return self._discrepancy_areas_cache[2]
 
     def calculate_area_of_large_discrepancies(
         self,
@@ -287,19 +654,9 @@ class PolygonMatcher:
         :param area_threshold: Threshold above which we return areas, defaults to 100
         :return: List of large areas.
         """
-        base_features_multipolygon = make_valid(
-            MultiPolygon(list(base_features_df.explode()))
-        )
-
-        red_area_calcs = [
-            make_valid(geom).area
-            for geom in base_features_multipolygon.intersection(
-                diff_df["geometry"]
-            ).explode()
-            if geom.area >= area_threshold
-        ]
+        red_areas = self._discrepancy_areas(base_features_df, diff_df)
 
-        return red_area_calcs
+        return red_areas[red_areas >= area_threshold].tolist()
 
     def calculate_total_area_of_discrepancies(
         self,
@@ -313,35 +670,34 @@ class PolygonMatcher:
         :param area_threshold: Threshold above which we return areas, defaults to 100
         :return: List of large areas.
         """
-        base_features_multipolygon = make_valid(
-            MultiPolygon(list(base_features_df.explode()))
-        )
-
-        red_area_calcs = [
-            make_valid(geom).area
-            for geom in base_features_multipolygon.intersection(
-                diff_df["geometry"]
-            ).explode()
-        ]
-
-        return sum(red_area_calcs)
+        return float(self._discrepancy_areas(base_features_df, diff_df).sum())
 
     def large_discrepancy_proportion(
         self,
         base_features_df: GeoSeries,
         aligned_df: GeoDataFrame,
         diff_df: GeoDataFrame,
+        simplify_tolerance: float = 0,
     ) -> float:
         """Calculates the percentage of our new boundary that is an area of concern.
 
         :param base_features_df: GeoSeries with base polygon features from Open Street Map.
         :param aligned_df: GeoDataFrame with new boundary.
         :param diff_df: GeoDataFrame with areas that differ to original boundary.
+        :param simplify_tolerance: Distance (m) within which base features and the diff are
+            simplified before intersecting them. Faster on detailed polygons but approximate,
+            defaults to 0 for the exact percentage.
         :return: Percentage of new boundary that is of concern.
         """
-        difference_area = unary_union(base_features_df).intersection(
-            diff_df["geometry"][0]
-        )
+        base_features = self._union_base_features(base_features_df)
+        diff_geom = diff_df["geometry"][0]
+        if simplify_tolerance > 0:
+            base_features, diff_geom = shapely.simplify(
+                np.array([base_features, diff_geom], dtype=object),
+                simplify_tolerance,
+                preserve_topology=True,
+            )
+        difference_area = shapely.intersection(base_features, diff_geom)
         new_border = aligned_df["geometry"][0]
         ratio = 100 * difference_area.area / new_border.area
 
@@ -1,3 +1,5 @@
+import numpy as np
+import shapely
 from pyproj import Geod
 from shapely import MultiPolygon
 from shapely.ops import nearest_points
@@ -28,5 +30,26 @@ def overlap_ratio(a: MultiPolygon, b: MultiPolygon) -> float:
     :param b: A shapely polygon
     :return: Fraction of total area that is overlap.
     """
+    if not shapely.intersects(a, b):
+        return 0.0
     overlap = a.intersection(b).area
     return overlap / (a.area + b.area - overlap)
+
+
+def overlap_ratios(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Find the overlap ratio, as in overlap_ratio, for each pair of polygons
+    from two arrays of the same length.
+
+    :param a: Array of shapely polygons
+    :param b: Array of shapely polygons
+    :return: Array of fractions of total area that is overlap.
+    """
+    a = np.asarray(a, dtype=object)
+    b = np.asarray(b, dtype=object)
+    overlaps = np.zeros(len(a))
+    # only pairs that touch need the intersection computed
+    intersecting = shapely.intersects(a, b)
+    overlaps[intersecting] = shapely.area(
+        shapely.intersection(a[intersecting], b[intersecting])
+    )
+    return overlaps / (shapely.area(a) + shapely.area(b) - overlaps)
@@ -1,12 +1,43 @@
+import hashlib
+import os
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Literal, get_args
 
 import numpy as np
 import polars as pl
+import torch
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer, util
+from sentence_transformers import SentenceTransformer
 
 _STRATEGIES = Literal["document", "chunk", "best_of_three"]
 DEFAULT_SEPARATORS = ["##", "\n\n", ". ", " ", ""]
+ENCODE_BATCH_SIZE = 64
+# number of recently embedded document sets each searcher keeps in memory
+EMBEDDING_CACHE_SIZE = 8
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+@lru_cache(maxsize=2)
+def _load_model(
+    model_name: str, device: str, quantize: bool, half_precision: bool
+) -> SentenceTransformer:
+    """Load an embedding model once, so searchers share its weights.
+
+    :param model_name: Name of the sentence transformers model.
+    :param device: Device to run the model on, "cuda" or "cpu".
+    :param quantize: Whether to quantize linear layers to int8 when running on CPU.
+    :param half_precision: Whether to run the model in FP16 when running on GPU.
+    :return: The loaded model.
+    """
+    model = SentenceTransformer(model_name, device=device)
+    if device == "cuda" and half_precision:
+        model.half()
+    elif device == "cpu" and quantize:
+        model[0].auto_model = torch.quantization.quantize_dynamic(
+            model[0].auto_model, {torch.nn.Linear}, dtype=torch.qint8
+        )
+    return model
 
 
 class SimilaritySearcher:
@@ -17,6 +48,12 @@ class SimilaritySearcher:
     :param strategy: One of "document", "chunk", "best_of_three",
     determines whether the similarity match is the closest document, closest chunk of
     a document, or document with the highest average for the top three chunks.
+    :param quantize: Run the embedding model with int8 weights when on CPU, faster but
+        slightly less accurate, defaults to False.
+    :param half_precision: Run the embedding model in FP16 when on GPU, faster but
+        slightly less accurate, defaults to False.
+    :param cache_dir: Directory to save document embeddings in, so searching the same
+        documents again skips embedding them. Defaults to None, no caching.
     """
 
     def __init__(
@@ -26,17 +63,31 @@ class SimilaritySearcher:
         chunk_overlap=75,
         separators: list[str] = DEFAULT_SEPARATORS,
         keep_chunk_separators=False,
+        quantize: bool = False,
+        cache_dir: str | None = None,
+        half_precision: bool = False,
     ):
         if strategy not in get_args(_STRATEGIES):
             raise ValueError("strategy must be one of {_STRATEGIES}")
         self.strategy = strategy
-        self.embedding_model = SentenceTransformer(
-            "sentence-transformers/all-MiniLM-L6-v2"
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+        self.embedding_model = _load_model(
+            EMBEDDING_MODEL, device, quantize, half_precision
         )
+        # embeddings differ between precisions, so cached ones are kept separate
+        self._model_key = f"{EMBEDDING_MODEL}:{device}:{quantize}:{half_precision}"
+        self.cache_dir = cache_dir
+        self._embedding_cache: OrderedDict[str, np.ndarray] = OrderedDict()
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.chunk_separators = separators
         self.keep_chunk_separators = keep_chunk_separators
+        self._text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size,
+            chunk_overlap=chunk_overlap,
+            separators=separators,
+            keep_separator=keep_chunk_separators,
+        )
 
     def search(
         self,
@@ -62,17 +113,18 @@ class SimilaritySearcher:
             return document_df
 
         # embed documents and the prompt for comparison
-        document_df = self._embed_documents(document_df)
-        query_embedding = self.embedding_model.encode(query)
+        document_df, document_embeddings = self._embed_documents(document_df)
+        query_embedding = self.embedding_model.encode(
+            query, normalize_embeddings=True, convert_to_numpy=True
+        )
 
-        # get similarity scores
+        # get similarity scores, embeddings are unit length so cosine similarity
+        # is a dot product
         document_df = document_df.with_columns(
-            similarity=util.cos_sim(
-                query_embedding, np.stack(document_df["embedding"].to_numpy())  # type: ignore
+            similarity=pl.Series(
+                document_embeddings @ query_embedding.astype(np.float32)
             )
-            .numpy()
-            .flatten()
-        )  # type: ignore
+        )
 
         if self.strategy == "document":
             return document_df[["id", "similarity"]].sort(
@@ -87,7 +139,7 @@ class SimilaritySearcher:
         else:
             return (
                 document_df.group_by("id")
-                .agg(pl.map_groups(exprs="similarity", function=self._top_three))
+                .agg(pl.col("similarity").top_k(3).mean())
                 .sort(by="similarity", descending=True)
             )
 
@@ -103,32 +155,88 @@ class SimilaritySearcher:
         """
         filter = document_df["text"].is_not_null()
         if keyword_filters:
+            # lowercase the text once, and match keywords as plain substrings
+            lowercase_text = document_df["text"].str.to_lowercase()
             for keyword in keyword_filters:
-                filter = filter & (
-                    document_df["text"].str.to_lowercase().str.contains(keyword.lower())
+                filter = filter & lowercase_text.str.contains(
+                    keyword.lower(), literal=True
                 )
         return document_df.filter(filter)
 
-    def _embed_documents(self, document_df: pl.DataFrame) -> pl.DataFrame:
+    def _embed_documents(
+        self, document_df: pl.DataFrame
+    ) -> tuple[pl.DataFrame, np.ndarray]:
         """Chunk and embed documents as appropriate for the search strategy chosen
         at initialisation.
 
         :param document_df:  Documents in dataframe of id,text columns.
-        :return: Dataframe with text column replaced by chunks and a column added
-            for embeddings.
+        :return: Dataframe with text column replaced by chunks, and a float32 array
+            with the unit length embedding of each row.
         """
         if self.strategy != "document":
             df = document_df.with_columns(
-                text=document_df["text"].map_elements(self._split_text)
+                text=pl.Series(
+                    [self._split_text(text) for text in document_df["text"].to_list()],
+                    dtype=pl.List(pl.String),
+                )
             )
             df = df.explode("text")
         else:
             df = document_df[["id", "text"]]
 
-        df = df.with_columns(
-            embedding=df["text"].map_elements(self.embedding_model.encode)
+        return df, self._encode_texts(df["text"].to_list())
+
+    def _encode_texts(self, texts: list[str]) -> np.ndarray:
+        """Embed texts, reusing embeddings of exactly the same texts from recent
+        searches, or saved in the cache directory.
+
+        :param texts: Texts to embed.
+        :return: float32 array with the unit length embedding of each text.
+        """
+        digest = hashlib.blake2b(self._model_key.encode())
+        for text in texts:
+            digest.update(text.encode() + b"\0")
+        key = digest.hexdigest()
+        if key in self._embedding_cache:
+            self._embedding_cache.move_to_end(key)
+            return self._embedding_cache[key]
+
+        embeddings = self._load_or_encode_texts(texts, key)
+        self._embedding_cache[key] = embeddings
+        if len(self._embedding_cache) > EMBEDDING_CACHE_SIZE:
+            self._embedding_cache.popitem(last=False)
+        return embeddings
+
+    def _load_or_encode_texts(self, texts: list[str], key: str) -> np.ndarray:
+        """Embed texts, reusing embeddings saved in the cache directory.
+
+        :param texts: Texts to embed.
+        :param key: Digest of the texts and model, naming the cached embeddings.
+        :return: float32 array with the unit length embedding of each text.
+        """
+        if self.cache_dir is not None:
+            cache_path = os.path.join(self.cache_dir, f"{key}.npy")
+            if os.path.exists(cache_path):
+                return np.load(cache_path)
+
+        # encode every chunk in one call so the model runs on batches
+        embeddings = self.embedding_model.encode(
+            texts,
+            batch_size=ENCODE_BATCH_SIZE,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
         )
-        return df
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # write then rename, so a partly written file is never loaded
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, embeddings)
+            os.replace(tmp_path, cache_path)
+        return embeddings
 
     def _split_text(self, text: str) -> list[str]:
         """Split text, preferring to split at separator
@@ -137,17 +245,5 @@ class SimilaritySearcher:
         :param text: Text to split into chunks
         :return: list of chunks.
         """
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=self.chunk_size,
-            chunk_overlap=self.chunk_overlap,
-            separators=self.chunk_separators,
-            keep_separator=self.keep_chunk_separators,
-        )
-
-        chunks = text_splitter.split_text(text)
+        chunks = self._text_splitter.split_text(text)
         return chunks
-
-    def _top_three(self, similarities):
-        """Returns mean of top 3 of a group of similarities."""
-        similarities = similarities[0].sort(descending=True)
-        return similarities[:3].mean()
@@ -1,4 +1,26 @@
-from .plotting_utils import generate_image, show_image, show_stats
-from .tree_finder import TreeFinder
+import importlib
+from typing import TYPE_CHECKING
 
-__all__ = ["TreeFinder", "generate_image", "show_image", "show_stats"]
+if TYPE_CHECKING:
+    from .boxes import Boxes
+    from .plotting_utils import generate_image, show_image, show_stats
+    from .tree_finder import TreeFinder
+
+__all__ = ["Boxes", "TreeFinder", "generate_image", "show_image", "show_stats"]
+
+# deepforest, torch and matplotlib are slow to import, so only load the module
+# that is asked for
+_MODMAP = {
+    "Boxes": "boxes",
+    "TreeFinder": "tree_finder",
+    "generate_image": "plotting_utils",
+    "show_image": "plotting_utils",
+    "show_stats": "plotting_utils",
+}
+
+
+def __getattr__(name: str):
+    if name in _MODMAP:
+        module = importlib.import_module(f".{_MODMAP[name]}", __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
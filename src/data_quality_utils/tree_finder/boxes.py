@@ -0,0 +1,56 @@
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+BOX_COLUMNS = ["xmin", "ymin", "xmax", "ymax"]
+
+
+@dataclass(slots=True, frozen=True)
+class Boxes:
+    """Predicted tree bounding boxes in pixels, held as one float32 array per
+    coordinate rather than a dict per box."""
+
+    xmin: np.ndarray
+    ymin: np.ndarray
+    xmax: np.ndarray
+    ymax: np.ndarray
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "Boxes":
+        """Create boxes from a dataframe with xmin, ymin, xmax and ymax columns."""
+        return cls(*(df[column].to_numpy(np.float32) for column in BOX_COLUMNS))
+
+    @classmethod
+    def from_records(
+        cls, records: list[dict[str, float]] | dict[str, float]
+    ) -> "Boxes":
+        """Create boxes from one or a list of dicts with xmin, ymin, xmax and ymax."""
+        if isinstance(records, dict):
+            records = [records]
+        array = np.array(
+            [[record[column] for column in BOX_COLUMNS] for record in records],
+            dtype=np.float32,
+        ).reshape(-1, 4)
+        return cls(*array.T)
+
+    def __len__(self) -> int:
+        return len(self.xmin)
+
+    def __getitem__(self, index: int) -> dict[str, float]:
+        """A single box as a dict of xmin, ymin, xmax and ymax."""
+        return {
+            column: float(values[index])
+            for column, values in zip(BOX_COLUMNS, self._columns())
+        }
+
+    def _columns(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        return self.xmin, self.ymin, self.xmax, self.ymax
+
+    def to_array(self) -> np.ndarray:
+        """Boxes as an (N, 4) array of xmin, ymin, xmax, ymax."""
+        return np.column_stack(self._columns())
+
+    def to_records(self) -> list[dict[str, float]]:
+        """Boxes as a list of dicts of xmin, ymin, xmax and ymax."""
+        return [self[index] for index in range(len(self))]
@@ -1,21 +1,27 @@
 import math
 
-from geopy.distance import geodesic
+import numpy as np
+from pyproj import Geod
 
 TILE_SIZE = 256
+# geodesic distances on the WGS84 ellipsoid, as geopy.distance.geodesic
+WGS84_GEOD = Geod(ellps="WGS84")
 
 
 def pixel_to_epsg4326(
-    x: float,
-    y: float,
+    x: float | np.ndarray,
+    y: float | np.ndarray,
     img_width: int,
     img_height: int,
     bbox: tuple[float, float, float, float],
-) -> tuple[float, float]:
-    """Convert image pixel coordinates to EPSG:4326 (lat/lon)."""
+) -> tuple[float | np.ndarray, float | np.ndarray]:
+    """Convert image pixel coordinates, or arrays of them, to EPSG:4326 (lat/lon)."""
     xmin, ymin, xmax, ymax = bbox
-    lon = xmin + (x / img_width) * (xmax - xmin)
-    lat = ymax - (y / img_height) * (ymax - ymin)
+    # degrees per pixel, so each coordinate is a single multiply-add
+    dx = (xmax - xmin) / img_width
+    dy = (ymax - ymin) / img_height
+    lon = xmin + x * dx
+    lat = ymax - y * dy
     return lon, lat
 
 
@@ -35,30 +41,79 @@ def epsg4326_to_pixel(
     return x_pixel, y_pixel
 
 
+def map_size(zoom: int, scale: float) -> float:
+    """Width and height in pixels of the whole web mercator map at a zoom level."""
+    return TILE_SIZE * 2**zoom * scale
+
+
 def epsg3857_to_tile(
-    lat: float, lon: float, zoom: int, scale: float
-) -> tuple[float, float]:
-    """Convert EPSG:3857 coordinates to pixel coordinates."""
-    siny = math.sin(math.radians(lat))
-    siny = min(max(siny, -0.9999), 0.9999)
-
-    map_size = TILE_SIZE * (2**zoom) * scale
-    x = (lon + 180) / 360 * map_size
-    y = (0.5 - math.log((1 + siny) / (1 - siny)) / (4 * math.pi)) * map_size
+    lat: float | np.ndarray,
+    lon: float | np.ndarray,
+    zoom: int,
+    scale: float,
+    size: float | None = None,
+) -> tuple[float | np.ndarray, float | np.ndarray]:
+    """Convert EPSG:3857 coordinates, or arrays of them, to pixel coordinates. The
+    map size can be passed in when converting many points at one zoom and scale."""
+    size = size or map_size(zoom, scale)
+    siny = np.clip(np.sin(np.radians(lat)), -0.9999, 0.9999)
+
+    x = (lon + 180) / 360 * size
+    y = (0.5 - np.log((1 + siny) / (1 - siny)) / (4 * math.pi)) * size
     return x, y
 
 
 def tile_to_epsg3857(
-    x: float, y: float, zoom: int, scale: float
-) -> tuple[float, float]:
-    """Convert pixel coordinates to EPSG:3857 (lat/lon)."""
-    map_size = TILE_SIZE * (2**zoom) * scale
-    lon = x / map_size * 360.0 - 180.0
-    n = math.pi - 2.0 * math.pi * y / map_size
-    lat = math.degrees(math.atan(math.sinh(n)))
+    x: float | np.ndarray,
+    y: float | np.ndarray,
+    zoom: int,
+    scale: float,
+    size: float | None = None,
+) -> tuple[float | np.ndarray, float | np.ndarray]:
+    """Convert pixel coordinates, or arrays of them, to EPSG:3857 (lat/lon). The
+    map size can be passed in when converting many points at one zoom and scale."""
+    size = size or map_size(zoom, scale)
+    lon = x / size * 360.0 - 180.0
+    n = math.pi - 2.0 * math.pi * y / size
+    lat = np.degrees(np.arctan(np.sinh(n)))
     return lat, lon
 
 
+def calculate_box_distances(
+    lat: float,
+    lon: float,
+    img_width: int,
+    img_height: int,
+    boxes: np.ndarray,
+    convert_coords: bool,
+    bbox: tuple[float, float, float, float] | None = None,
+    zoom: int | None = None,
+    scale: float | None = None,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Calculate distances from an (N, 4) array of xmin, ymin, xmax, ymax tree boxes
+    to a given geographic location, returning arrays of box centre lats, lons and
+    distances in meters."""
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    x_centers = (boxes[:, 0] + boxes[:, 2]) / 2
+    y_centers = (boxes[:, 1] + boxes[:, 3]) / 2
+
+    if convert_coords:
+        size = map_size(zoom, scale)
+        center_px, center_py = epsg3857_to_tile(lat, lon, zoom, scale, size)
+        abs_px = center_px - (img_width / 2) + x_centers
+        abs_py = center_py - (img_height / 2) + y_centers
+        pred_lats, pred_lons = tile_to_epsg3857(abs_px, abs_py, zoom, scale, size)
+    else:
+        pred_lons, pred_lats = pixel_to_epsg4326(
+            x_centers, y_centers, img_width, img_height, bbox
+        )
+
+    _, _, box_dists = WGS84_GEOD.inv(
+        pred_lons, pred_lats, np.full_like(pred_lons, lon), np.full_like(pred_lats, lat)
+    )
+    return pred_lats, pred_lons, np.asarray(box_dists)
+
+
 def calculate_distances(
     lat: float,
     lon: float,
@@ -71,24 +126,16 @@ def calculate_distances(
     scale: float | None = None,
 ) -> list[tuple[tuple[float, float], float, dict[str, float]]]:
     """Calculate distances from predicted tree boxes to a given geographic location."""
-    distances = []
-    for box in pred_boxes:
-        x_center = (box["xmin"] + box["xmax"]) / 2
-        y_center = (box["ymin"] + box["ymax"]) / 2
-
-        if convert_coords:
-            center_px, center_py = epsg3857_to_tile(lat, lon, zoom, scale)
-            abs_px = center_px - (img_width / 2) + x_center
-            abs_py = center_py - (img_height / 2) + y_center
-            pred_lat, pred_lon = tile_to_epsg3857(abs_px, abs_py, zoom, scale)
-        else:
-            pred_lon, pred_lat = pixel_to_epsg4326(
-                x_center, y_center, img_width, img_height, bbox
-            )
-
-        box_dist = geodesic((pred_lat, pred_lon), (lat, lon)).meters
-        distances.append(((pred_lat, pred_lon), box_dist, box))
-    return distances
+    boxes = [[box["xmin"], box["ymin"], box["xmax"], box["ymax"]] for box in pred_boxes]
+    pred_lats, pred_lons, box_dists = calculate_box_distances(
+        lat, lon, img_width, img_height, boxes, convert_coords, bbox, zoom, scale
+    )
+    return [
+        ((pred_lat, pred_lon), box_dist, box)
+        for pred_lat, pred_lon, box_dist, box in zip(
+            pred_lats.tolist(), pred_lons.tolist(), box_dists.tolist(), pred_boxes
+        )
+    ]
 
 
 def get_coordinate_point(
@@ -6,25 +6,39 @@ import numpy as np
 from matplotlib import pyplot as plt
 from matplotlib.figure import Figure
 
+from .boxes import Boxes
+
 COLOR = "#00625E"
 
 
 def _generate_boxes(
-    image: np.ndarray, pred_boxes: list[dict[str, float]] | dict[str, float]
+    image: np.ndarray, pred_boxes: Boxes | list[dict[str, float]] | dict[str, float]
 ) -> None:
-    """Draw bounding boxes on the image."""
+    """Draw bounding boxes on the image, all in a single OpenCV call."""
     thickness = max(1, image.shape[0] // 500)
-    if isinstance(pred_boxes, dict):
-        pred_boxes = [pred_boxes]
-    for box in pred_boxes:
-        cv2.rectangle(
-            image,
-            (int(box["xmin"]), int(box["ymin"])),
-            (int(box["xmax"]), int(box["ymax"])),
-            (255, 165, 0),
-            thickness=thickness,
-            lineType=cv2.LINE_AA,
-        )
+    if not isinstance(pred_boxes, Boxes):
+        pred_boxes = Boxes.from_records(pred_boxes)
+    if len(pred_boxes) == 0:
+        return
+    xmin, ymin, xmax, ymax = pred_boxes.to_array().astype(np.int32).T
+    # the four corners of each box as a closed polygon
+    polygons = np.stack(
+        [
+            np.column_stack([xmin, ymin]),
+            np.column_stack([xmax, ymin]),
+            np.column_stack([xmax, ymax]),
+            np.column_stack([xmin, ymax]),
+        ],
+        axis=1,
+    )
+    cv2.polylines(
+        image,
+        list(polygons),
+        isClosed=True,
+        color=(255, 165, 0),
+        thickness=thickness,
+        lineType=cv2.LINE_AA,
+    )
 
 
 def _generate_point(image: np.ndarray, point: tuple[int, int]) -> None:
@@ -35,15 +49,17 @@ def _generate_point(image: np.ndarray, point: tuple[int, int]) -> None:
 
 def generate_image(
     image: np.ndarray,
-    pred_boxes: list[dict[str, float]] | dict[str, float],
+    pred_boxes: Boxes | list[dict[str, float]] | dict[str, float],
     point: tuple[int, int] | None = None,
+    inplace: bool = False,
 ) -> np.ndarray:
-    """Overlay bounding boxes and optional point on the image."""
-    image_copy = image.copy()
-    _generate_boxes(image_copy, pred_boxes)
+    """Overlay bounding boxes and optional point on the image, drawing on the image
+    itself rather than a copy if inplace is set."""
+    target = image if inplace else image.copy()
+    _generate_boxes(target, pred_boxes)
     if point:
-        _generate_point(image_copy, point)
-    return image_copy
+        _generate_point(target, point)
+    return target
 
 
 def _show_single(image: np.ndarray, image_title: str | None) -> Figure:
@@ -72,28 +88,55 @@ def _show_multiple(
     return fig
 
 
+def _save_pixels(images: np.ndarray | list[np.ndarray], save_path: str) -> bool:
+    """Write images side by side to a file as they would be shown, returning False
+    if they can't be joined because their heights differ."""
+    if isinstance(images, list):
+        if len({image.shape[0] for image in images}) > 1:
+            return False
+        images = np.hstack(images)
+    os.makedirs(os.path.dirname(save_path), exist_ok=True)
+    # matplotlib shows arrays as RGB, while OpenCV writes them as BGR
+    cv2.imwrite(save_path, cv2.cvtColor(images, cv2.COLOR_RGB2BGR))
+    return True
+
+
 def show_image(
     images: np.ndarray | list[np.ndarray],
     image_titles: str | list[str] | None = None,
     save_path: str | None = None,
+    dpi: int = 300,
+    only_save: bool = False,
 ) -> None:
-    """Show one or more images."""
+    """Show one or more images, saving them at the given dpi if a save_path is
+    given. A lower dpi, such as 150, saves much faster when reviewing many images.
+    With only_save, the images are saved to save_path without being shown. Their
+    pixels are written straight to the file side by side, without titles,
+    skipping matplotlib, unless their heights differ."""
+    if only_save and save_path and _save_pixels(images, save_path):
+        return
     if isinstance(images, list):
         fig = _show_multiple(images, image_titles)
     else:
         fig = _show_single(images, image_titles)
     if save_path:
         os.makedirs(os.path.dirname(save_path), exist_ok=True)
-        fig.savefig(save_path, dpi=300, bbox_inches="tight")
-    plt.show()
+        fig.savefig(save_path, dpi=dpi, bbox_inches="tight")
+    if only_save:
+        # release the figure rather than leaving it open for a later show
+        plt.close(fig)
+    else:
+        plt.show()
 
 
-def show_stats(stats_dict: dict[str, list[float]]) -> None:
+def show_stats(stats_dict: dict[str, np.ndarray | list[float]]) -> None:
     """Plot histograms of tree detection distances for each image type."""
-    max_distance = math.ceil(max(max(type_stats) for type_stats in stats_dict.values()))
+    max_distance = math.ceil(
+        max(np.max(type_stats) for type_stats in stats_dict.values())
+    )
     num_stats = len(stats_dict)
 
-    bins = list(range(0, max_distance + 1))
+    bins = np.arange(0, max_distance + 1)
 
     fig, axes = plt.subplots(
         num_stats, 1, sharex=True, figsize=(6, 6), height_ratios=[1, 1]
@@ -101,7 +144,16 @@ def show_stats(stats_dict: dict[str, list[float]]) -> None:
     fig.subplots_adjust(hspace=0.1)
 
     for ax, type, type_stats in zip(axes, stats_dict.keys(), stats_dict.values()):
-        ax.hist(type_stats, bins=bins, color=COLOR, label=f"{type} image")
+        # bin with numpy and draw the counts directly
+        counts, _ = np.histogram(type_stats, bins=bins)
+        ax.bar(
+            bins[:-1],
+            counts,
+            width=1.0,
+            align="edge",
+            color=COLOR,
+            label=f"{type} image",
+        )
         ax.set_title(f"{type} error distribution")
         ax.set_ylabel("Count")
         # ax.legend(loc="best")
@@ -1,15 +1,22 @@
-import glob
-import json
+import hashlib
 import logging
 import os
 import shutil
 import sys
+import threading
 import warnings
+import zipfile
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterable, Iterator
 
 import cv2
 import kagglehub
 import numpy as np
+import orjson
+import torch
 from deepforest import main
 
 from data_quality_utils.map_extractor.map_utils import (
@@ -17,9 +24,16 @@ from data_quality_utils.map_extractor.map_utils import (
     GoogleStaticMetadata,
     GoogleTilesMetadata,
     WMSMetadata,
+    metadata_filename,
 )
 
-from .distance_utils import calculate_distances, get_coordinate_point
+from .boxes import Boxes
+from .distance_utils import calculate_box_distances, get_coordinate_point
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
 
 # silence some deepforest warnings
 warnings.filterwarnings(
@@ -31,6 +45,11 @@ warnings.filterwarnings(
 )
 
 logger = logging.getLogger(__name__)
+METADATA_CLASSES: dict[str, type[BaseMetadata]] = {
+    "static": GoogleStaticMetadata,
+    "tiles": GoogleTilesMetadata,
+    "wms": WMSMetadata,
+}
 MODEL_INFERENCE = {"patch_size": 5000, "patch_overlap": 0.9, "iou_threshold": 1}
 
 
@@ -48,6 +67,90 @@ def suppress_output():
             sys.stderr = old_stderr
 
 
+@contextmanager
+def _file_lock(lock_path: str):
+    """Hold an exclusive lock on a file, so only one process at a time runs the
+    block. Where fcntl is unavailable, as on Windows, the block runs unlocked."""
+    if fcntl is None:
+        yield
+        return
+    with open(lock_path, "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+@lru_cache(maxsize=1024)
+def _load_metadata(metadata_filename: str, modified_time: float) -> BaseMetadata:
+    """Parse a metadata file, once for each time it is modified."""
+    with open(metadata_filename, "rb") as f:
+        content = f.read()
+    metadata_dict = orjson.loads(content)
+
+    metadata_type = metadata_dict.get("type")
+    metadata_class = METADATA_CLASSES.get(metadata_type)
+    if metadata_class is None:
+        raise ValueError(f"Unsupported metadata type: {metadata_type}")
+    return metadata_class(**metadata_dict)
+
+
+def _checkpoint_is_intact(checkpoint_path: str) -> bool:
+    """
+    Check a downloaded checkpoint against the SHA-256 digest recorded alongside it.
+
+    :param checkpoint_path: Path of the checkpoint file.
+    :return: Whether the checkpoint exists and matches its recorded digest.
+    """
+    try:
+        stat = os.stat(checkpoint_path)
+    except OSError:
+        return False
+    return _digest_matches(
+        os.path.abspath(checkpoint_path), stat.st_ino, stat.st_size, stat.st_mtime_ns
+    )
+
+
+@lru_cache(maxsize=8)
+def _digest_matches(
+    checkpoint_path: str, inode: int, size: int, modified_time: int
+) -> bool:
+    """Hash a checkpoint, once for each file written at its path, and compare it
+    with its recorded digest."""
+    try:
+        with open(checkpoint_path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+    except OSError:
+        return False
+    try:
+        with open(checkpoint_path + ".sha256") as f:
+            expected = f.read().strip()
+    except OSError:
+        # checkpoints downloaded before digests were recorded are only trusted,
+        # and their digest recorded, if they are complete
+        if not _is_complete_archive(checkpoint_path):
+            return False
+        _record_digest(checkpoint_path, digest)
+        return True
+    return digest == expected
+
+
+def _is_complete_archive(checkpoint_path: str) -> bool:
+    """Check every member of a checkpoint, which torch saves as a zip archive,
+    against its CRC, so truncated or corrupted files are caught."""
+    try:
+        with zipfile.ZipFile(checkpoint_path) as archive:
+            return archive.testzip() is None
+    except (OSError, zipfile.BadZipFile):
+        return False
+
+
+def _record_digest(checkpoint_path: str, digest: str) -> None:
+    with open(checkpoint_path + ".sha256", "w") as f:
+        f.write(digest)
+
+
 class TreeFinder:
     """
     A TreeFinder class which can process an image to detect
@@ -55,76 +158,162 @@ class TreeFinder:
     and plot some statistics.
     """
 
-    def __init__(self):
-        checkpoint_path = self._download_model_checkpoint()
-        self.model = main.deepforest.load_from_checkpoint(
-            checkpoint_path=checkpoint_path
-        )
+    # loaded models shared by every instance, keyed by their inference settings
+    _MODELS: dict[tuple[bool, bool], main.deepforest] = {}
+    _MODELS_LOCK = threading.Lock()
+
+    def __init__(self, mixed_precision: bool = True, compile_model: bool = False):
+        """
+        :param mixed_precision: Run inference in float16, or bfloat16 where supported,
+            when a GPU is available.
+        :param compile_model: Compile the detection network with torch.compile.
+        """
+        self.model = type(self)._get_model(mixed_precision, compile_model)
+
+    @classmethod
+    def _get_model(cls, mixed_precision: bool, compile_model: bool) -> main.deepforest:
+        """Load the model with the given inference settings on first use, and
+        return the same model to every later caller."""
+        key = (mixed_precision, compile_model)
+        with cls._MODELS_LOCK:
+            if key not in cls._MODELS:
+                checkpoint_path = cls._download_model_checkpoint()
+                model = main.deepforest.load_from_checkpoint(
+                    checkpoint_path=checkpoint_path
+                )
+                model.eval()
+                cls._configure_inference(model, mixed_precision, compile_model)
+                if torch.cuda.is_available():
+                    cls._warm_up(model)
+                cls._MODELS[key] = model
+            return cls._MODELS[key]
+
+    @classmethod
+    def reset_model(cls) -> None:
+        """Forget the loaded models, so the next TreeFinder loads its own."""
+        with cls._MODELS_LOCK:
+            cls._MODELS.clear()
+
+    @staticmethod
+    def _configure_inference(
+        model: main.deepforest, mixed_precision: bool, compile_model: bool
+    ) -> None:
+        """Set up reduced precision and compilation, keeping float32 on CPU."""
+        if torch.cuda.is_available():
+            # patches are mostly the same size, so the fastest convolution
+            # algorithms found for the first one are reused for the rest
+            torch.backends.cudnn.benchmark = True
+        if mixed_precision and torch.cuda.is_available():
+            precision = "bf16-mixed" if torch.cuda.is_bf16_supported() else "16-mixed"
+            model.create_trainer(precision=precision)
+
+        if compile_model:
+            try:
+                model.model = torch.compile(
+                    model.model, mode="reduce-overhead", fullgraph=False
+                )
+            except Exception as e:
+                logger.warning(f"Could not compile model, running uncompiled: {e}")
+
+    @staticmethod
+    def _warm_up(model: main.deepforest) -> None:
+        """Run the model once on a blank image, so CUDA initialisation and kernel
+        selection happen here rather than in the first real prediction."""
+        blank = np.zeros((256, 256, 3), dtype=np.uint8)
+        with suppress_output(), torch.inference_mode():
+            model.predict_tile(
+                image=blank,
+                return_plot=False,
+                patch_size=256,
+                patch_overlap=0.0,
+                iou_threshold=1,
+            )
 
-    def _download_model_checkpoint(self) -> str:
+    @staticmethod
+    def _download_model_checkpoint() -> str:
         """Download and return the model checkpoint path."""
         destination_path = "model_checkpoint.ckpt"
 
-        if os.path.exists(destination_path):
+        if _checkpoint_is_intact(destination_path):
             logging.info(
                 f"Model checkpoint already exists at {destination_path}, skipping download."
             )
             return destination_path
 
-        download_path = kagglehub.dataset_download(
-            "easzil/dataset", path="model.opendata_luftbild_dop60.patch400.ckpt"
-        )
-        shutil.copyfile(download_path, destination_path)
-        logging.info(f"Downloaded model checkpoint to {destination_path}")
+        # workers starting together download the checkpoint once, the rest wait
+        # for it and find it intact
+        with _file_lock(destination_path + ".lock"):
+            if not _checkpoint_is_intact(destination_path):
+                download_path = kagglehub.dataset_download(
+                    "easzil/dataset",
+                    path="model.opendata_luftbild_dop60.patch400.ckpt",
+                )
+                # copy under a temporary name so an interrupted copy is never
+                # mistaken for a complete checkpoint
+                shutil.copyfile(download_path, destination_path + ".tmp")
+                with open(destination_path + ".tmp", "rb") as f:
+                    digest = hashlib.file_digest(f, "sha256").hexdigest()
+                os.replace(destination_path + ".tmp", destination_path)
+                _record_digest(destination_path, digest)
+                logging.info(f"Downloaded model checkpoint to {destination_path}")
         return destination_path
 
-    def _predict_boxes(self, image: np.ndarray) -> list[dict[str, float]]:
+    def _predict_boxes(
+        self, image: np.ndarray, patch_overlap: float | None = None
+    ) -> Boxes:
         """Run the model on the image and return predicted bounding boxes."""
-        with suppress_output():
+        inference = MODEL_INFERENCE
+        if patch_overlap is not None:
+            inference = {**MODEL_INFERENCE, "patch_overlap": patch_overlap}
+        with suppress_output(), torch.inference_mode():
             pred_boxes = self.model.predict_tile(
-                image=image, return_plot=False, **MODEL_INFERENCE
+                image=image, return_plot=False, **inference
             )
-        # convert to list of dicts
-        pred_boxes = pred_boxes[["xmin", "ymin", "xmax", "ymax"]].to_dict(
-            orient="records"
-        )
-        return pred_boxes
+        return Boxes.from_dataframe(pred_boxes)
 
     def _get_image_metadata(self, filename: str) -> BaseMetadata | None:
         """Load and return metadata as a structured dataclass."""
-        metadata_filename = filename.replace(".png", ".json")
-        if not os.path.exists(metadata_filename):
+        meta_filename = metadata_filename(filename)
+        try:
+            modified_time = os.path.getmtime(meta_filename)
+        except OSError:
             return None
+        return _load_metadata(meta_filename, modified_time)
 
-        with open(metadata_filename) as f:
-            metadata_dict = json.load(f)
-
-        metadata_type = metadata_dict.get("type")
-        if metadata_type == "static":
-            return GoogleStaticMetadata(**metadata_dict)
-        elif metadata_type == "tiles":
-            return GoogleTilesMetadata(**metadata_dict)
-        elif metadata_type == "wms":
-            return WMSMetadata(**metadata_dict)
-        else:
-            raise ValueError(f"Unsupported metadata type: {metadata_type}")
-
-    def find_all_trees(self, filename: str) -> list[dict[str, float]]:
+    def find_all_trees(
+        self, filename: str, patch_overlap: float | None = None
+    ) -> list[dict[str, float]]:
         """
         Detects all trees in an image and returns bounding boxes.
 
         :param filename: Path to the image file.
+        :param patch_overlap: Fraction of overlap between the patches the image is
+            split into, defaults to MODEL_INFERENCE["patch_overlap"].
         :return: A list of predicted bounding boxes as dictionaries.
         """
+        return self.find_all_tree_boxes(filename, patch_overlap).to_records()
+
+    def find_all_tree_boxes(
+        self, filename: str, patch_overlap: float | None = None
+    ) -> Boxes:
+        """
+        Detects all trees in an image and returns bounding boxes as coordinate
+        arrays.
+
+        :param filename: Path to the image file.
+        :param patch_overlap: Fraction of overlap between the patches the image is
+            split into, defaults to MODEL_INFERENCE["patch_overlap"].
+        :return: The predicted bounding boxes.
+        """
         image = cv2.imread(filename)
-        pred_boxes = self._predict_boxes(image)
-        return pred_boxes
+        return self._predict_boxes(image, patch_overlap)
 
     def find_closest_tree(
         self,
         filename: str,
         convert_coords: bool = False,
         flag_threshold: float = 10,
+        patch_overlap: float | None = None,
     ) -> tuple[float, bool, dict[str, float], tuple[int, int]] | None:
         """
         Finds the tree closest to the GPS coordinate in the image metadata.
@@ -132,12 +321,15 @@ class TreeFinder:
         :param filename: Path to the image file.
         :param convert_coords: Whether to convert coordinates from pseudo Mercator.
         :param flag_threshold: Distance threshold for flagging trees.
-        :return: Tuple of (distance in meters, flagged boolean, closest box, coordinate point).
+        :param patch_overlap: Fraction of overlap between the patches the image is
+            split into, defaults to MODEL_INFERENCE["patch_overlap"].
+        :return: Tuple of (distance in meters, flagged boolean, closest box, coordinate point),
+            or None if no trees are found.
         """
-        image = cv2.imread(filename)
         metadata = self._get_image_metadata(filename)
         if metadata is None:
             raise FileNotFoundError("Metadata file not found")
+        image = cv2.imread(filename)
 
         lat = metadata.lat
         lon = metadata.lon
@@ -146,68 +338,168 @@ class TreeFinder:
         bbox = getattr(metadata, "bbox", None)
         img_size = image.shape[:2]
 
-        pred_boxes = self._predict_boxes(image)
+        pred_boxes = self._predict_boxes(image, patch_overlap)
+        if len(pred_boxes) == 0:
+            return None
 
-        distances = calculate_distances(
+        _, _, distances = calculate_box_distances(
             lat,
             lon,
             img_size[0],
             img_size[1],
-            pred_boxes,
+            pred_boxes.to_array(),
             convert_coords,
             bbox,
             zoom,
             scale,
         )
-        distances.sort(key=lambda x: x[1])
+        best_index = int(np.argmin(distances))
 
         point = get_coordinate_point(lat, lon, bbox, img_size, convert_coords)
 
-        best_box = distances[0][2]
-        best_dist = distances[0][1]
+        best_box = pred_boxes[best_index]
+        best_dist = float(distances[best_index])
         flagged = best_dist >= flag_threshold
 
         return best_dist, flagged, best_box, point
 
-    def get_stats(self, paths: list[str], types: list[str]) -> dict[str, list[float]]:
-        """Compute distance statistics for tree predictions across multiple image sets."""
+    def _read_image(
+        self, filename: str, flags: int = cv2.IMREAD_COLOR
+    ) -> tuple[BaseMetadata | None, np.ndarray | None]:
+        """Load an image's metadata, and the image itself only if it has metadata."""
+        metadata = self._get_image_metadata(filename)
+        if not metadata:
+            return None, None
+        return metadata, cv2.imread(filename, flags)
+
+    def _load_images(
+        self,
+        filenames: Iterable[str],
+        executor: ThreadPoolExecutor,
+        prefetch: int,
+        flags: int = cv2.IMREAD_COLOR,
+    ) -> Iterator[tuple[str, BaseMetadata, np.ndarray]]:
+        """
+        Read images with their metadata in background threads, in order, while
+        the caller runs the model on earlier ones.
+
+        :param filenames: Paths of the images to read.
+        :param executor: Thread pool to read the images in.
+        :param prefetch: Most images to read ahead, to bound memory use.
+        :param flags: OpenCV flags to read the images with.
+        :return: Each filename with its metadata and image, skipping images
+            without metadata.
+        """
+        pending = deque()
+        for filename in filenames:
+            pending.append(
+                (filename, executor.submit(self._read_image, filename, flags))
+            )
+            if len(pending) >= prefetch:
+                yield from self._finish_read(*pending.popleft())
+        while pending:
+            yield from self._finish_read(*pending.popleft())
+
+    @staticmethod
+    def _finish_read(
+        filename: str, future: Future
+    ) -> Iterator[tuple[str, BaseMetadata, np.ndarray]]:
+        metadata, image = future.result()
+        if not metadata:
+            logger.error(f"No metadata found for image {filename}")
+            return
+        yield filename, metadata, image
+
+    def get_stats(
+        self,
+        paths: list[str],
+        types: list[str],
+        max_workers: int | None = None,
+        patch_overlap: float | None = None,
+        reduced: bool = False,
+        as_array: bool = False,
+    ) -> dict[str, list[float]] | dict[str, np.ndarray]:
+        """
+        Compute distance statistics for tree predictions across multiple image sets.
+
+        :param paths: Directories of images with metadata, one for each image set.
+        :param types: Metadata type of the images in each directory.
+        :param max_workers: Number of threads reading images ahead of the model,
+            defaults to the number of CPUs.
+        :param patch_overlap: Fraction of overlap between the patches each image is
+            split into, defaults to MODEL_INFERENCE["patch_overlap"].
+        :param reduced: Run the model on images read at half resolution, which is
+            about four times faster but may miss small trees.
+        :param as_array: Return each type's distances as a float32 array rather
+            than a list.
+        :return: Distance to the closest tree in each image, keyed by type.
+        """
         stats = {}
-        for path, type in zip(paths, types):
-            type_stats = []
-            convert_coords = type == "static"
-
-            filenames = glob.glob(f"{path}/*.png")
-            for filename in filenames:
-                image = cv2.imread(filename)
-                pred_boxes = self._predict_boxes(image)
-
-                metadata = self._get_image_metadata(filename)
-                if not metadata:
-                    logger.error(f"No metadata found for image {filename}")
-                    continue
+        max_workers = max_workers or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for path, type in zip(paths, types):
+                best_distances = self._best_distances(
+                    path, type, executor, 2 * max_workers, patch_overlap, reduced
+                )
+                if as_array:
+                    stats[type] = np.fromiter(best_distances, dtype=np.float32)
+                else:
+                    stats[type] = list(best_distances)
+        return stats
+
+    def _best_distances(
+        self,
+        path: str,
+        type: str,
+        executor: ThreadPoolExecutor,
+        prefetch: int,
+        patch_overlap: float | None,
+        reduced: bool,
+    ) -> Iterator[float]:
+        """Distance to the closest tree in each image of one directory."""
+        convert_coords = type == "static"
+        flags = cv2.IMREAD_REDUCED_COLOR_2 if reduced else cv2.IMREAD_COLOR
+        # boxes found on a half resolution image are scaled back to full size
+        factor = 2 if reduced else 1
+
+        try:
+            entries = os.scandir(path)
+        except FileNotFoundError:
+            logger.error(f"Image directory {path} not found")
+            return
+        with entries:
+            # stream directory entries rather than collecting the whole listing
+            filenames = (
+                entry.path
+                for entry in entries
+                if entry.name.endswith(".png") and not entry.name.startswith(".")
+            )
+            for filename, metadata, image in self._load_images(
+                filenames, executor, prefetch, flags
+            ):
+                pred_boxes = self._predict_boxes(image, patch_overlap)
 
                 lat = metadata.lat
                 lon = metadata.lon
                 zoom = getattr(metadata, "zoom", None)
                 scale = getattr(metadata, "scale", 1)
                 bbox = getattr(metadata, "bbox", None)
-                img_size = image.shape[:2]
+                img_size = (image.shape[0] * factor, image.shape[1] * factor)
 
-                distances = calculate_distances(
+                if len(pred_boxes) == 0:
+                    logger.warning(f"No trees found in image {filename}")
+                    continue
+
+                _, _, distances = calculate_box_distances(
                     lat,
                     lon,
                     img_size[0],
                     img_size[1],
-                    pred_boxes,
+                    pred_boxes.to_array() * factor,
                     convert_coords,
                     bbox,
                     zoom,
                     scale,
                 )
-                distances.sort(key=lambda x: x[1])
-
-                best_dist = distances[0][1]
-                type_stats.append(best_dist)
 
-            stats[type] = type_stats
-        return stats
+                yield float(distances.min())
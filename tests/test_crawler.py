@@ -1,7 +1,12 @@
+import sqlite3
+
+import pytest
 from crawl4ai.deep_crawling.filters import ContentTypeFilter, URLPatternFilter
 from crawl4ai.deep_crawling.scorers import KeywordRelevanceScorer
 
 from data_quality_utils.crawler import Crawler  # type: ignore
+from data_quality_utils.crawler.cache import CrawlCache
+from data_quality_utils.crawler.utils import clean_url
 
 
 def test_crawler_initialization():
@@ -21,6 +26,11 @@ def test_filter_initialisation():
     assert isinstance(crawler.filter_chain.filters[1], URLPatternFilter)
 
 
+def test_unknown_filter_type():
+    with pytest.raises(ValueError):
+        Crawler(filters=[{"type": "NotAFilter"}])
+
+
 def test_scorer_initialisation():
     keyword_scorer = {
         "keywords": ["conservation", "planning", "building", "heritage"],
@@ -30,3 +40,70 @@ def test_scorer_initialisation():
 
     assert isinstance(crawler.keyword_scorer, KeywordRelevanceScorer)
     assert crawler.keyword_scorer._keywords == keyword_scorer["keywords"]
+
+
+@pytest.mark.parametrize(
+    "url, expected",
+    [
+        ("http://www.example.gov.uk/page#section", "https://example.gov.uk/page"),
+        (
+            "https://example.gov.uk/a%20b.pdf/download?inline",
+            "https://example.gov.uk/a b.pdf",
+        ),
+        ("https://example.gov.uk/page", "https://example.gov.uk/page"),
+    ],
+)
+def test_clean_url(url, expected):
+    assert clean_url(url) == expected
+
+
+def test_crawl_cache(tmp_path):
+    cache = CrawlCache(str(tmp_path / "crawl_cache.db"))
+    pages = [
+        ("https://example.gov.uk", "# Home"),
+        ("https://example.gov.uk/a.pdf", None),
+    ]
+
+    assert cache.get_crawl("html:1:https://example.gov.uk") is None
+    cache.set_crawl("html:1:https://example.gov.uk", pages)
+    assert cache.get_crawl("html:1:https://example.gov.uk") == pages
+
+
+def test_crawl_cache_closes(tmp_path):
+    with CrawlCache(str(tmp_path / "crawl_cache.db")) as cache:
+        cache.set_crawl("key", [("https://example.gov.uk", "# Home")])
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        cache.get_crawl("key")
+
+
+def test_crawler_closes_cache(tmp_path):
+    crawler = Crawler(cache_path=str(tmp_path / "crawl_cache.db"))
+    cache = crawler._get_cache()
+    crawler.close()
+
+    with pytest.raises(sqlite3.ProgrammingError):
+        cache.get_crawl("key")
+    # the cache is opened again if the crawler is used after closing
+    assert crawler._get_cache().get_crawl("key") is None
+    crawler.close()
+
+
+def test_crawl_key_covers_settings():
+    crawler = Crawler(max_depth=2)
+    assert crawler._settings_key == Crawler(max_depth=2)._settings_key
+    assert crawler._settings_key != Crawler(max_depth=3)._settings_key
+    assert (
+        crawler._settings_key
+        != Crawler(max_depth=2, include_external=True)._settings_key
+    )
+    assert (
+        crawler._settings_key
+        != Crawler(
+            max_depth=2, filters=[{"type": "URLPatternFilter", "patterns": ["*a*"]}]
+        )._settings_key
+    )
+    assert (
+        crawler._settings_key
+        != Crawler(max_depth=2, keyword_scorer={"keywords": ["planning"]})._settings_key
+    )
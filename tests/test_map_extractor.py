@@ -0,0 +1,216 @@
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+
+from data_quality_utils.map_extractor.google_map_tiles_extractor import (
+    GoogleMapTilesExtractor,
+)
+from data_quality_utils.map_extractor.map_utils import (
+    GoogleTilesMetadata,
+    metadata_filename,
+)
+
+LONS = np.array([-0.1276, -1.8904, -3.1883, 0.0])
+LATS = np.array([51.5072, 52.4862, 55.9533, 0.0])
+
+
+def test_xy_coordinates_batch_matches_scalar():
+    extractor = GoogleMapTilesExtractor(google_api_key="")
+    xtiles, ytiles = extractor.get_xy_coordinates_batch(LONS, LATS, zoom=18)
+    expected = [
+        extractor.get_xy_coordinates(lon, lat, zoom=18) for lon, lat in zip(LONS, LATS)
+    ]
+    assert list(zip(xtiles.tolist(), ytiles.tolist())) == expected
+
+
+def test_lonlat_coordinates_batch_inverts_xy():
+    extractor = GoogleMapTilesExtractor(google_api_key="")
+    xtiles, ytiles = extractor.get_xy_coordinates_batch(LONS, LATS, zoom=18)
+    lons, lats = extractor.get_lonlat_coordinates_batch(xtiles, ytiles, zoom=18)
+    # north-west corner of the tile containing each point
+    assert np.all(lons <= LONS) and np.all(lats >= LATS)
+    assert np.allclose(lons, LONS, atol=360 / 2**18)
+    assert np.allclose(lats, LATS, atol=360 / 2**18)
+
+
+def test_save_metadata(tmp_path):
+    extractor = GoogleMapTilesExtractor(google_api_key="")
+    metadata = GoogleTilesMetadata(lat=51.5, lon=-0.1, zoom=18, img_size=(256, 256))
+    extractor.save_metadata(str(tmp_path / "tiles" / "tile.png"), metadata)
+
+    with open(tmp_path / "tiles" / "tile.json") as f:
+        assert json.load(f) == {
+            "lat": 51.5,
+            "lon": -0.1,
+            "img_size": [256, 256],
+            "zoom": 18,
+            "type": "tiles",
+        }
+
+
+def test_download_image_skips_existing(tmp_path):
+    extractor = GoogleMapTilesExtractor(google_api_key="")
+    filename = str(tmp_path / "tile.png")
+    with open(filename, "wb") as f:
+        f.write(b"png")
+    extractor.save_metadata(
+        filename, GoogleTilesMetadata(lat=51.5, lon=-0.1, zoom=18, img_size=(256, 256))
+    )
+    # no network access is needed to skip an existing tile
+    extractor._session = None
+    extractor.download_image(lat=51.5, lon=-0.1, zoom=18, filename=filename)
+
+    assert extractor.is_downloaded(filename)
+    assert not extractor.is_downloaded(str(tmp_path / "other.png"))
+
+
+def test_download_image_replaces_other_request(tmp_path):
+    extractor = GoogleMapTilesExtractor(google_api_key="")
+    extractor._session = FakeTileSession()
+    filename = str(tmp_path / "tile.png")
+    extractor.download_image(lat=51.5, lon=-0.1, zoom=18, filename=filename)
+    # the same filename reused for a different point
+    extractor.download_image(lat=52.5, lon=-1.1, zoom=18, filename=filename)
+
+    assert extractor._session.requests == 2
+    with open(tmp_path / "tile.json") as f:
+        assert json.load(f)["lat"] == 52.5
+
+
+def test_download_images_leaves_out_failures(tmp_path):
+    extractor = GoogleMapTilesExtractor(google_api_key="")
+    extractor._session = FakeTileSession()
+    (tmp_path / "file").write_bytes(b"")
+    good = str(tmp_path / "tile.png")
+    # a file is in the way of this image's directory
+    bad = str(tmp_path / "file" / "tile.png")
+
+    saved = extractor.download_images(
+        [
+            dict(lat=51.5, lon=-0.1, zoom=18, filename=good),
+            dict(lat=51.5, lon=-0.1, zoom=18, filename=bad),
+        ]
+    )
+
+    assert saved == [good]
+
+
+def test_metadata_filename():
+    assert metadata_filename("out.png/tile.png") == "out.png/tile.json"
+
+
+def test_submit(tmp_path):
+    with GoogleMapTilesExtractor(google_api_key="") as extractor:
+        # no network access is needed to skip an existing tile
+        extractor._session = None
+        filename = str(tmp_path / "tile.png")
+        with open(filename, "wb") as f:
+            f.write(b"png")
+        extractor.save_metadata(
+            filename,
+            GoogleTilesMetadata(lat=51.5, lon=-0.1, zoom=18, img_size=(256, 256)),
+        )
+        futures = [
+            extractor.submit(lat=51.5, lon=-0.1, zoom=18, filename=filename)
+            for _ in range(50)
+        ]
+
+    assert all(future.done() and future.exception() is None for future in futures)
+
+
+ETAG = '"tile-v1"'
+
+
+class FakeTileSession:
+    def __init__(self):
+        self.requests = 0
+
+    def post(self, url, **kwargs):
+        return FakeResponse(json={"session": "token"})
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests += 1
+        if headers and headers.get("If-None-Match") == ETAG:
+            return FakeResponse(status_code=304)
+        return FakeResponse(content=b"png", headers={"ETag": ETAG})
+
+
+class FakeResponse:
+    def __init__(self, json=None, content=b"", status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self._json = json
+        self._content = content
+
+    def json(self):
+        return self._json
+
+    def iter_content(self, chunk_size):
+        yield self._content
+
+    def raise_for_status(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def test_manifest_reuses_tiles(tmp_path):
+    extractor = GoogleMapTilesExtractor(
+        google_api_key="", manifest_path=str(tmp_path / "manifest.db")
+    )
+    extractor._session = FakeTileSession()
+    # two points within the same tile
+    extractor.download_image(
+        lat=51.50001, lon=-0.10001, zoom=18, filename=str(tmp_path / "a" / "1.png")
+    )
+    extractor.download_image(
+        lat=51.50002, lon=-0.10002, zoom=18, filename=str(tmp_path / "b" / "2.png")
+    )
+
+    assert extractor._session.requests == 1
+    assert (tmp_path / "b" / "2.png").read_bytes() == b"png"
+    with open(tmp_path / "b" / "2.json") as f:
+        assert json.load(f)["lat"] == 51.50002
+
+
+def test_manifest_conditional_request(tmp_path):
+    extractor = GoogleMapTilesExtractor(
+        google_api_key="", manifest_path=str(tmp_path / "manifest.db")
+    )
+    extractor._session = FakeTileSession()
+    filename = str(tmp_path / "tile.png")
+    extractor.download_image(lat=51.5, lon=-0.1, zoom=18, filename=filename)
+    # the server reports the tile is unchanged, so the existing file is kept
+    extractor.download_image(
+        lat=51.5, lon=-0.1, zoom=18, filename=filename, overwrite=True
+    )
+
+    assert extractor._session.requests == 2
+    assert (tmp_path / "tile.png").read_bytes() == b"png"
+
+
+def test_close_releases_connections(tmp_path):
+    closed = []
+
+    class ClosingSession(FakeTileSession):
+        def close(self):
+            closed.append(self)
+
+    with GoogleMapTilesExtractor(
+        google_api_key="", manifest_path=str(tmp_path / "manifest.db")
+    ) as extractor:
+        extractor._session = ClosingSession()
+        manifest = extractor._manifest
+
+    assert len(closed) == 1
+    with pytest.raises(sqlite3.ProgrammingError):
+        manifest.get("tile")
@@ -1,26 +1,24 @@
+import numpy as np
 import pytest
-from geopandas import GeoDataFrame
-from shapely import Polygon, unary_union
+from geopandas import GeoDataFrame, GeoSeries
+from shapely import LineString, MultiPolygon, Point, Polygon, box, union_all
 
-from data_quality_utils.polygon.polygon_matcher import PolygonMatcher
+from data_quality_utils.polygon.plotting import extract_coordinates
+from data_quality_utils.polygon.polygon_matcher import PolygonMatcher, _repair_invalid
+from data_quality_utils.polygon.utils import overlap_ratio, overlap_ratios
 
 BASE_CRS = "EPSG:4326"
 MERCATOR_CRS = "EPSG:3857"
 
 
+# corners of a square centred on the origin with half-width 1
+UNIT_SQUARE = np.array([[1, 1], [1, -1], [-1, -1], [-1, 1]], dtype=np.float64)
+
+
 def create_square_coords(
-    lat: int = 0, long: int = 0, add_buffer: float = 0.01
-) -> Polygon:
-    poly_list = [
-        (long + add[0], lat + add[1])
-        for add in [
-            (add_buffer, add_buffer),
-            (add_buffer, -add_buffer),
-            (-add_buffer, -add_buffer),
-            (-add_buffer, add_buffer),
-        ]
-    ]
-    return poly_list
+    lat: float = 0, long: float = 0, add_buffer: float = 0.01
+) -> np.ndarray:
+    return UNIT_SQUARE * add_buffer + [long, lat]
 
 
 def create_polygon_df(coords_list: list, crs: str) -> GeoDataFrame:
@@ -29,25 +27,25 @@ def create_polygon_df(coords_list: list, crs: str) -> GeoDataFrame:
     return gdf
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def square_df() -> GeoDataFrame:
     base_list = create_square_coords()
     return create_polygon_df(base_list, BASE_CRS)
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def small_square_df(add_buffer: float = 0.001) -> GeoDataFrame:
     base_list = create_square_coords(add_buffer=add_buffer)
     return create_polygon_df(base_list, BASE_CRS)
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def very_small_square_df(add_buffer: float = 10**-12) -> GeoDataFrame:
     base_list = create_square_coords(add_buffer=add_buffer)
     return create_polygon_df(base_list, BASE_CRS)
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def rectangle_df(long: float = 0, lat: float = 0) -> GeoDataFrame:
     return create_polygon_df(
         [
@@ -58,7 +56,7 @@ def rectangle_df(long: float = 0, lat: float = 0) -> GeoDataFrame:
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def L_shape_df() -> GeoDataFrame:
     return create_polygon_df(
         [
@@ -73,7 +71,7 @@ def L_shape_df() -> GeoDataFrame:
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def shifted_pentagon_df(
     long: float = 0, lat: float = 0, shift: float = 0.0001
 ) -> GeoDataFrame:
@@ -92,7 +90,7 @@ def shifted_pentagon_df(
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def shorter_pentagon_df(long: float = 0, lat: float = 0) -> GeoDataFrame:
     return create_polygon_df(
         [
@@ -109,7 +107,7 @@ def shorter_pentagon_df(long: float = 0, lat: float = 0) -> GeoDataFrame:
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def pentagon_df(long: float = 0, lat: float = 0) -> GeoDataFrame:
     return create_polygon_df(
         [
@@ -126,7 +124,7 @@ def pentagon_df(long: float = 0, lat: float = 0) -> GeoDataFrame:
     )
 
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def triangle_df(long: float = 0, lat: float = 0) -> GeoDataFrame:
     return create_polygon_df(
         [
@@ -222,7 +220,9 @@ def test_area_proportions(
     base_df = rectangle_df.copy()
     diff_df = triangle_df.copy()
     features_df = shorter_pentagon_df.copy()
-    aligned_poly = unary_union([base_df.geometry, features_df.geometry])
+    aligned_poly = union_all(
+        np.concatenate([base_df.geometry.to_numpy(), features_df.geometry.to_numpy()])
+    )
     aligned_df = GeoDataFrame([1], geometry=[aligned_poly], crs=matcher.base_crs)
     diff_df = diff_df.to_crs(matcher.mercator_crs)
     aligned_df = aligned_df.to_crs(matcher.mercator_crs)
@@ -254,6 +254,20 @@ def test_known_area_proportions(
     assert area_proportion == 50
 
 
+def test_simplified_area_proportions(
+    rectangle_df: GeoDataFrame, small_square_df: GeoDataFrame
+):
+    matcher = PolygonMatcher()
+    aligned_df = small_square_df.to_crs(matcher.mercator_crs)
+    diff_df = rectangle_df.to_crs(matcher.mercator_crs)
+    # a detailed outline of the rectangle, with a vertex every 10m
+    features_series = diff_df.geometry.segmentize(10)
+    area_proportion = matcher.large_discrepancy_proportion(
+        features_series, aligned_df, diff_df, simplify_tolerance=1.0
+    )
+    assert area_proportion == pytest.approx(50)
+
+
 def test_very_thin_polygon_filtered(very_small_square_df: GeoDataFrame):
     matcher = PolygonMatcher()
     diff_df = very_small_square_df.copy()
@@ -303,3 +317,227 @@ def test_L_shape_bounding_box_filtered(L_shape_df: GeoDataFrame):
     )
 
     assert filtered_diff_polygon.area != 0
+
+
+@pytest.fixture
+def osm_features(monkeypatch):
+    """Serve the given features in place of downloading them from OSM, returning
+    the tags of each query made."""
+
+    def serve(features_df: GeoDataFrame) -> list[dict]:
+        queries = []
+
+        def features_from_polygon(polygon, tags):
+            queries.append(tags)
+            return features_df
+
+        monkeypatch.setattr(
+            "data_quality_utils.polygon.polygon_matcher.ox.features_from_polygon",
+            features_from_polygon,
+        )
+        return queries
+
+    return serve
+
+
+def test_osm_download_reused(osm_features, square_df: GeoDataFrame):
+    matcher = PolygonMatcher()
+    features_df = GeoDataFrame(
+        {"landuse": ["residential", "farmland", None], "natural": [None, None, "wood"]},
+        geometry=[square_df.geometry.iloc[0]] * 3,
+        crs=BASE_CRS,
+    )
+    queries = osm_features(features_df)
+
+    nearby_tags = matcher.find_near_tags(square_df)
+    base_features_series = matcher.download_osm_polygons(
+        square_df, {"landuse": ["residential"], "natural": "wood"}
+    )
+
+    # Features are filtered from the tag search rather than downloaded again
+    assert queries == [{"landuse": True, "natural": True}]
+    assert nearby_tags == {"landuse": ["residential", "farmland"], "natural": ["wood"]}
+    assert len(base_features_series) == 2
+
+
+def test_osm_download_saved(osm_features, tmp_path, square_df: GeoDataFrame):
+    features_df = GeoDataFrame(
+        {"landuse": ["residential", None], "nodes": [[1, 2, 3], None]},
+        geometry=[square_df.geometry.iloc[0], LineString([(0, 0), (0.001, 0)])],
+        crs=BASE_CRS,
+    )
+    queries = osm_features(features_df)
+
+    tags = {"landuse": ["residential"]}
+    downloaded_series = PolygonMatcher(
+        osm_cache_dir=str(tmp_path)
+    ).download_osm_polygons(square_df, tags)
+    # A new matcher reads the features saved by the first
+    saved_series = PolygonMatcher(osm_cache_dir=str(tmp_path)).download_osm_polygons(
+        square_df, tags
+    )
+
+    assert len(queries) == 1
+    assert len(saved_series) == 2
+    assert saved_series.area.sum() == pytest.approx(downloaded_series.area.sum())
+
+
+def test_distant_features_not_snapped(square_df: GeoDataFrame):
+    matcher = PolygonMatcher()
+    distant_features_series = GeoSeries(
+        [Polygon(create_square_coords(lat=1, long=1))], crs=BASE_CRS
+    ).to_crs(MERCATOR_CRS)
+    aligned_df, diff_df = matcher.match_polygon_to_features(
+        square_df, distant_features_series
+    )
+
+    assert aligned_df.geometry[0].equals(square_df.to_crs(MERCATOR_CRS).geometry[0])
+    assert diff_df.geometry[0].area == 0
+
+
+def test_union_of_adjacent_and_overlapping_features():
+    left = Polygon(create_square_coords(long=-1, add_buffer=1))
+    right = Polygon(create_square_coords(long=1, add_buffer=1))
+    overlapping = Polygon(create_square_coords(long=0.5, add_buffer=1))
+    adjacent_union = PolygonMatcher._union_geometries(np.array([left, right]))
+    overlapping_union = PolygonMatcher._union_geometries(
+        np.array([left, right, overlapping])
+    )
+
+    assert adjacent_union.equals(union_all([left, right]))
+    assert overlapping_union.equals(union_all([left, right, overlapping]))
+
+
+@pytest.mark.parametrize(
+    "features",
+    [
+        # edges only partly shared
+        [box(0, 0, 1, 1), box(1, 0.5, 2, 1.5)],
+        # a T-junction, where one edge meets the middle of another
+        [box(0, 0, 2, 1), box(0, 1, 1, 2), box(1, 1, 2, 2)],
+    ],
+)
+def test_union_of_unevenly_noded_features(features: list[Polygon]):
+    union = PolygonMatcher._union_geometries(np.array(features))
+
+    assert union.is_valid
+    assert union.equals(union_all(features))
+
+
+def test_overlapping_features_total(
+    square_df: GeoDataFrame, small_square_df: GeoDataFrame
+):
+    matcher = PolygonMatcher()
+    diff_df = square_df.to_crs(matcher.mercator_crs)
+    small_square = small_square_df.to_crs(matcher.mercator_crs).geometry.iloc[0]
+    # Two overlapping features inside the area of concern
+    features_series = GeoSeries(
+        [small_square, small_square.buffer(10)], crs=matcher.mercator_crs
+    )
+    large_area_total = matcher.calculate_total_area_of_discrepancies(
+        features_series, diff_df
+    )
+    # The overlap is only counted once
+    assert large_area_total == pytest.approx(union_all(features_series.to_numpy()).area)
+
+
+def test_osm_lines_buffered(osm_features, square_df: GeoDataFrame):
+    matcher = PolygonMatcher(line_buffer=5)
+    features_df = GeoDataFrame(
+        {"highway": ["primary", "primary", "primary"]},
+        geometry=[
+            LineString([(0, 0), (0.001, 0)]),
+            Point(0, 0),
+            square_df.geometry.iloc[0],
+        ],
+        crs=BASE_CRS,
+    )
+    osm_features(features_df)
+
+    base_features_series = matcher.download_osm_polygons(
+        square_df, {"highway": ["primary"]}
+    )
+
+    # Points are dropped and lines become thin polygons
+    assert list(base_features_series.geom_type) == ["Polygon", "Polygon"]
+    assert base_features_series.crs == matcher.mercator_crs
+    assert base_features_series.iloc[0].area == pytest.approx(
+        features_df.to_crs(matcher.mercator_crs).geometry.iloc[0].buffer(5).area
+    )
+
+
+def test_overlap_ratios_match_pairwise():
+    polygons_a = [
+        Polygon(create_square_coords(lat=0, long=0)),
+        Polygon(create_square_coords(lat=0, long=0)),
+        Polygon(create_square_coords(lat=0, long=0)),
+    ]
+    polygons_b = [
+        Polygon(create_square_coords(lat=0, long=0)),
+        Polygon(create_square_coords(lat=0, long=0.01)),
+        Polygon(create_square_coords(lat=1, long=1)),
+    ]
+    ratios = overlap_ratios(np.array(polygons_a), np.array(polygons_b))
+
+    assert ratios.tolist() == pytest.approx([1, 1 / 3, 0])
+    assert ratios.tolist() == pytest.approx(
+        [overlap_ratio(a, b) for a, b in zip(polygons_a, polygons_b)]
+    )
+
+
+def test_extract_coordinates():
+    square = Polygon(create_square_coords(add_buffer=1))
+    square_with_hole = Polygon(
+        create_square_coords(long=5, add_buffer=2),
+        [create_square_coords(long=5, add_buffer=1)],
+    )
+    lons, lats = extract_coordinates(MultiPolygon([square, square_with_hole]))
+
+    # Only exteriors are drawn, each followed by a break
+    assert lons == [1, 1, -1, -1, 1, None, 7, 7, 3, 3, 7, None]
+    assert lats == [1, -1, -1, 1, 1, None, 2, -2, -2, 2, 2, None]
+
+
+def test_extract_coordinates_simplified():
+    # a square with an extra vertex part way along one side
+    square = Polygon([(1, 1), (1, 0), (1, -1), (-1, -1), (-1, 1)])
+    lons, lats = extract_coordinates(MultiPolygon([square]), simplify_tolerance=0.1)
+
+    assert lons == [1, 1, -1, -1, 1, None]
+    assert lats == [1, -1, -1, 1, 1, None]
+
+
+def test_mercator_projection_reused(pentagon_df: GeoDataFrame):
+    matcher = PolygonMatcher()
+    features_series = pentagon_df.geometry.copy()
+    projected = matcher._to_mercator(features_series)
+
+    assert projected.crs == matcher.mercator_crs
+    # equal geometries reuse the projection
+    assert matcher._to_mercator(features_series.copy()) is projected
+    # geometries without a CRS are taken to be projected already
+    naive_series = GeoSeries(features_series.to_numpy())
+    assert matcher._to_mercator(naive_series) is naive_series
+
+    # a frame changed in place is projected again
+    features_series.iloc[0] = Polygon(create_square_coords())
+    reprojected = matcher._to_mercator(features_series)
+    assert reprojected is not projected
+    expected = GeoSeries([Polygon(create_square_coords())], crs=BASE_CRS).to_crs(
+        matcher.mercator_crs
+    )
+    assert reprojected.iloc[0].equals_exact(expected.iloc[0], tolerance=1e-6)
+
+
+def test_repair_invalid():
+    square = Polygon(create_square_coords())
+    valid = np.array([square, square], dtype=object)
+    assert _repair_invalid(valid) is valid
+
+    bowtie = Polygon([(0, 0), (1, 1), (1, 0), (0, 1)])
+    with_invalid = np.array([square, bowtie], dtype=object)
+    repaired = _repair_invalid(with_invalid)
+    assert repaired[0] is square
+    assert repaired[1].is_valid
+    # the input is left untouched
+    assert with_invalid[1] is bowtie
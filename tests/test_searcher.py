@@ -8,11 +8,23 @@ from data_quality_utils.similarity_searcher import (
 
 
 class MockEncoder:
-    def __init__(self, model):
+    def __init__(self, model, device=None):
         pass
 
-    def encode(self, encode_str: str) -> np.ndarray:
-        return np.asarray([encode_str.count(letter) for letter in "abc"], dtype=float)
+    def encode(
+        self, sentences: str | list[str], normalize_embeddings: bool = False, **kwargs
+    ) -> np.ndarray:
+        embeddings = np.asarray(
+            [
+                [sentence.count(letter) for letter in "abc"]
+                for sentence in np.atleast_1d(sentences)
+            ],
+            dtype=float,
+        )
+        if normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.maximum(norms, 1e-12)
+        return embeddings[0] if isinstance(sentences, str) else embeddings
 
 
 # patch encoder
@@ -38,3 +50,72 @@ def test_keyword_filter():
         data=[["1", "2", "3", "4"], ["aa", None, "b", "c"]], schema=["id", "text"]
     )
     assert len(searcher.search(query="aa", document_df=df, keyword_filters=["b"])) == 1
+
+
+def test_similarity_ranking():
+    searcher = SimilaritySearcher(strategy="document")
+    df = pl.DataFrame(data=[["1", "2", "3"], ["b", "aab", "a"]], schema=["id", "text"])
+    results = searcher.search(query="aa", document_df=df)
+
+    assert results["id"].to_list() == ["3", "2", "1"]
+    assert np.allclose(results["similarity"].to_numpy(), [1, 2 / np.sqrt(5), 0])
+
+
+def test_model_shared():
+    searcher = SimilaritySearcher(strategy="document")
+    other_searcher = SimilaritySearcher(strategy="chunk")
+    assert searcher.embedding_model is other_searcher.embedding_model
+
+
+def test_best_of_three():
+    searcher = SimilaritySearcher(
+        strategy="best_of_three", chunk_size=1, chunk_overlap=0, separators=[" "]
+    )
+    df = pl.DataFrame(data=[["1", "2"], ["a a b b", "a b b b"]], schema=["id", "text"])
+    results = searcher.search(query="a", document_df=df)
+
+    # mean of the three most similar chunks
+    assert results["id"].to_list() == ["1", "2"]
+    assert np.allclose(results["similarity"].to_numpy(), [2 / 3, 1 / 3])
+
+
+def count_encodes(monkeypatch, searcher: SimilaritySearcher) -> list:
+    """Record the sentences passed to the searcher's embedding model from now on."""
+    encoded = []
+    encode = searcher.embedding_model.encode
+
+    def counting_encode(sentences, **kwargs):
+        encoded.append(sentences)
+        return encode(sentences, **kwargs)
+
+    monkeypatch.setattr(searcher.embedding_model, "encode", counting_encode)
+    return encoded
+
+
+def test_embeddings_cached(monkeypatch, tmp_path):
+    searcher = SimilaritySearcher(strategy="document", cache_dir=str(tmp_path))
+    df = pl.DataFrame(data=[["1", "2", "3"], ["b", "aab", "a"]], schema=["id", "text"])
+    results = searcher.search(query="aa", document_df=df)
+
+    # a new searcher has nothing in memory, so embeddings come from the cache dir
+    other_searcher = SimilaritySearcher(strategy="document", cache_dir=str(tmp_path))
+    encoded = count_encodes(monkeypatch, other_searcher)
+    cached_results = other_searcher.search(query="aa", document_df=df)
+
+    # only the query is embedded the second time
+    assert encoded == ["aa"]
+    assert cached_results.equals(results)
+
+
+def test_embeddings_reused_in_memory(monkeypatch):
+    searcher = SimilaritySearcher(strategy="document")
+    df = pl.DataFrame(data=[["1", "2", "3"], ["b", "aab", "a"]], schema=["id", "text"])
+    results = searcher.search(query="aa", document_df=df)
+
+    encoded = count_encodes(monkeypatch, searcher)
+    other_results = searcher.search(query="b", document_df=df)
+
+    # only the new query is embedded
+    assert encoded == ["b"]
+    assert other_results["id"].to_list() == ["1", "2", "3"]
+    assert len(results) == len(other_results)
@@ -1,8 +1,20 @@
+import json
+import zipfile
+
+import cv2
 import numpy as np
 import pytest
 
-from data_quality_utils.tree_finder import TreeFinder
+import data_quality_utils.tree_finder.plotting_utils as plotting_utils
+import data_quality_utils.tree_finder.tree_finder as tree_finder_module
+from data_quality_utils.tree_finder import (
+    Boxes,
+    TreeFinder,
+    generate_image,
+    show_image,
+)
 from data_quality_utils.tree_finder.distance_utils import (
+    calculate_box_distances,
     calculate_distances,
     epsg3857_to_tile,
     epsg4326_to_pixel,
@@ -10,6 +22,7 @@ from data_quality_utils.tree_finder.distance_utils import (
     pixel_to_epsg4326,
     tile_to_epsg3857,
 )
+from data_quality_utils.tree_finder.tree_finder import MODEL_INFERENCE
 
 LAT = 51.607777
 LON = -0.570024
@@ -35,15 +48,22 @@ class MockModel:
 TreeFinder.model = MockModel()
 
 
-def test_predict_boxes():
+@pytest.fixture
+def tree_finder() -> TreeFinder:
+    # skip __init__, which downloads the model checkpoint, and inject the mock
+    tree_finder = TreeFinder.__new__(TreeFinder)
+    tree_finder.model = MockModel()
+    return tree_finder
+
+
+def test_predict_boxes(tree_finder):
     image = np.zeros((500, 500, 3), dtype=np.uint8)
-    tree_finder = TreeFinder()
-    tree_finder.model = MockModel()  # inject the mock
 
     boxes = tree_finder._predict_boxes(image)
 
-    assert isinstance(boxes, list)
-    assert boxes == [
+    assert isinstance(boxes, Boxes)
+    assert boxes.xmin.dtype == np.float32
+    assert boxes.to_records() == [
         {"xmin": 10, "ymin": 20, "xmax": 30, "ymax": 40},
         {"xmin": 50, "ymin": 60, "xmax": 70, "ymax": 80},
     ]
@@ -77,6 +97,14 @@ def test_epsg3857_to_tile():
     assert abs(y - expected_y) <= 0.01
 
 
+def test_epsg3857_to_tile_arrays():
+    lats, lons = np.array([LAT, 0.0, 89.9]), np.array([LON, 0.0, 179.9])
+    xs, ys = epsg3857_to_tile(lats, lons, ZOOM, SCALE)
+
+    expected = [epsg3857_to_tile(lat, lon, ZOOM, SCALE) for lat, lon in zip(lats, lons)]
+    assert np.allclose(np.column_stack([xs, ys]), expected, rtol=0, atol=1e-6)
+
+
 def test_tile_to_epsg3857():
     x, y = 66896343.64, 44570627.75
 
@@ -137,6 +165,26 @@ def test_calculate_distances(
         assert abs(dist[1] - exp) <= 0.01
 
 
+def test_calculate_box_distances_matches_records():
+    boxes = np.array([[319.0, 178.0, 340.0, 200.0], [364.0, 396.0, 388.0, 420.0]])
+    lats, lons, dists = calculate_box_distances(
+        LAT, LON, IMG_WIDTH, IMG_HEIGHT, boxes, False, BBOX
+    )
+    records = calculate_distances(
+        LAT,
+        LON,
+        IMG_WIDTH,
+        IMG_HEIGHT,
+        [dict(zip(["xmin", "ymin", "xmax", "ymax"], box)) for box in boxes],
+        False,
+        BBOX,
+    )
+
+    assert [((lat, lon), dist) for (lat, lon), dist, _ in records] == list(
+        zip(zip(lats.tolist(), lons.tolist()), dists.tolist())
+    )
+
+
 @pytest.mark.parametrize(
     "convert_coords, bbox, expected",
     [
@@ -149,3 +197,306 @@ def test_get_coordinate_point(convert_coords, bbox, expected):
     assert isinstance(point, tuple)
     assert len(point) == 2
     assert point == expected
+
+
+@pytest.mark.parametrize("inplace", [True, False])
+def test_generate_image(inplace):
+    image = np.zeros((500, 500, 3), dtype=np.uint8)
+    drawn = generate_image(
+        image, {"xmin": 10, "ymin": 20, "xmax": 30, "ymax": 40}, (250, 250), inplace
+    )
+
+    assert drawn.any()
+    assert (drawn is image) == inplace
+    assert image.any() == inplace
+
+
+@pytest.mark.parametrize("image_size", [500, 1500])
+def test_generate_image_matches_rectangles(image_size):
+    records = [
+        {"xmin": 10, "ymin": 20, "xmax": 30, "ymax": 40},
+        # partly outside the image
+        {"xmin": -5, "ymin": 450, "xmax": 200, "ymax": 520},
+    ]
+    image = np.zeros((image_size, image_size, 3), dtype=np.uint8)
+    drawn = generate_image(image, records)
+
+    expected = image.copy()
+    for box in records:
+        cv2.rectangle(
+            expected,
+            (box["xmin"], box["ymin"]),
+            (box["xmax"], box["ymax"]),
+            (255, 165, 0),
+            thickness=max(1, image_size // 500),
+            lineType=cv2.LINE_AA,
+        )
+    assert np.array_equal(drawn, expected)
+
+
+def test_show_image_only_save(tmp_path):
+    image = np.zeros((20, 30, 3), dtype=np.uint8)
+    image[..., 0] = 255
+    save_path = str(tmp_path / "images" / "image.png")
+
+    show_image([image, image], save_path=save_path, only_save=True)
+
+    saved = cv2.imread(save_path)
+    assert saved.shape == (20, 60, 3)
+    # written so that it looks the same as when shown, red first
+    assert np.array_equal(saved[0, 0], [0, 0, 255])
+
+
+def test_show_image_only_save_never_shows(tmp_path, monkeypatch):
+    shown = []
+    monkeypatch.setattr(plotting_utils.plt, "show", lambda: shown.append(True))
+    tall = np.zeros((40, 30, 3), dtype=np.uint8)
+    wide = np.zeros((20, 30, 3), dtype=np.uint8)
+    save_path = str(tmp_path / "images" / "image.png")
+
+    # images of different heights can't be joined and go through matplotlib
+    show_image([tall, wide], save_path=save_path, only_save=True, dpi=50)
+
+    assert cv2.imread(save_path) is not None
+    assert shown == []
+    assert plotting_utils.plt.get_fignums() == []
+
+
+@pytest.fixture
+def wms_image(tmp_path) -> str:
+    filename = str(tmp_path / "tree.png")
+    cv2.imwrite(filename, np.zeros((*IMG_SIZE, 3), dtype=np.uint8))
+    with open(tmp_path / "tree.json", "w") as f:
+        json.dump(
+            {"lat": LAT, "lon": LON, "img_size": IMG_SIZE, "bbox": BBOX, "type": "wms"},
+            f,
+        )
+    return filename
+
+
+def test_find_closest_tree(tree_finder, wms_image):
+    best_dist, flagged, best_box, point = tree_finder.find_closest_tree(wms_image)
+
+    expected_dists = [
+        dist
+        for _, dist, _ in calculate_distances(
+            LAT,
+            LON,
+            IMG_WIDTH,
+            IMG_HEIGHT,
+            tree_finder._predict_boxes(None).to_records(),
+            False,
+            BBOX,
+        )
+    ]
+    assert best_dist == pytest.approx(min(expected_dists))
+    assert flagged == (best_dist >= 10)
+    assert best_box == {"xmin": 50, "ymin": 60, "xmax": 70, "ymax": 80}
+    assert point == (250, 250)
+
+
+def test_find_all_trees(tree_finder, wms_image):
+    records = tree_finder.find_all_trees(wms_image)
+    boxes = tree_finder.find_all_tree_boxes(wms_image)
+
+    assert records == [
+        {"xmin": 10, "ymin": 20, "xmax": 30, "ymax": 40},
+        {"xmin": 50, "ymin": 60, "xmax": 70, "ymax": 80},
+    ]
+    assert isinstance(boxes, Boxes)
+    assert boxes.to_records() == records
+
+
+def test_get_stats_skips_images_without_metadata(tree_finder, wms_image, tmp_path):
+    cv2.imwrite(str(tmp_path / "no_metadata.png"), np.zeros((*IMG_SIZE, 3), np.uint8))
+    predicted = []
+
+    class CountingModel(MockModel):
+        def predict_tile(self, image, **kwargs):
+            predicted.append(image)
+            return super().predict_tile(image, **kwargs)
+
+    tree_finder.model = CountingModel()
+    stats = tree_finder.get_stats([str(tmp_path)], ["wms"])
+
+    # the model only runs on the image with metadata
+    assert len(predicted) == 1
+    assert len(stats["wms"]) == 1
+    assert isinstance(stats["wms"], list)
+
+
+def test_predict_boxes_patch_overlap(tree_finder):
+    calls = []
+
+    class RecordingModel(MockModel):
+        def predict_tile(self, image, **kwargs):
+            calls.append(kwargs)
+            return super().predict_tile(image, **kwargs)
+
+    tree_finder.model = RecordingModel()
+    tree_finder._predict_boxes(None)
+    tree_finder._predict_boxes(None, patch_overlap=0.2)
+
+    assert calls[0]["patch_overlap"] == MODEL_INFERENCE["patch_overlap"]
+    assert calls[1]["patch_overlap"] == 0.2
+    assert calls[1]["patch_size"] == MODEL_INFERENCE["patch_size"]
+
+
+def test_download_model_checkpoint(tree_finder, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    download = tmp_path / "download.ckpt"
+    download.write_bytes(b"weights")
+    downloads = []
+
+    def dataset_download(handle, path):
+        downloads.append(path)
+        return str(download)
+
+    monkeypatch.setattr(
+        tree_finder_module.kagglehub, "dataset_download", dataset_download
+    )
+
+    path = tree_finder._download_model_checkpoint()
+    assert (tmp_path / path).read_bytes() == b"weights"
+    tree_finder._download_model_checkpoint()
+    assert len(downloads) == 1
+
+    # a corrupted checkpoint is downloaded again
+    (tmp_path / path).write_bytes(b"weigh")
+    tree_finder._download_model_checkpoint()
+    assert len(downloads) == 2
+    assert (tmp_path / path).read_bytes() == b"weights"
+
+
+def write_checkpoint(path) -> None:
+    """Write a small checkpoint, a zip archive like those torch saves."""
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("checkpoint/data.pkl", b"weights")
+
+
+def test_existing_checkpoint_without_digest_is_kept(tree_finder, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_checkpoint(tmp_path / "model_checkpoint.ckpt")
+    monkeypatch.setattr(tree_finder_module.kagglehub, "dataset_download", None)
+
+    tree_finder._download_model_checkpoint()
+
+    assert (tmp_path / "model_checkpoint.ckpt.sha256").exists()
+
+
+def test_truncated_checkpoint_without_digest_is_replaced(
+    tree_finder, tmp_path, monkeypatch
+):
+    monkeypatch.chdir(tmp_path)
+    write_checkpoint(tmp_path / "download.ckpt")
+    complete = (tmp_path / "download.ckpt").read_bytes()
+    (tmp_path / "model_checkpoint.ckpt").write_bytes(complete[:-10])
+    monkeypatch.setattr(
+        tree_finder_module.kagglehub,
+        "dataset_download",
+        lambda handle, path: str(tmp_path / "download.ckpt"),
+    )
+
+    tree_finder._download_model_checkpoint()
+
+    assert (tmp_path / "model_checkpoint.ckpt").read_bytes() == complete
+
+
+def test_get_stats_reduced(tree_finder, wms_image, tmp_path):
+    shapes = []
+
+    class ScaledModel(MockModel):
+        def predict_tile(self, image, **kwargs):
+            shapes.append(image.shape)
+            # the same trees, as seen at the image's resolution
+            boxes = super().predict_tile(image, **kwargs)
+            return boxes * image.shape[0] // IMG_SIZE[0]
+
+    tree_finder.model = ScaledModel()
+    full = tree_finder.get_stats([str(tmp_path)], ["wms"])
+    reduced = tree_finder.get_stats([str(tmp_path)], ["wms"], reduced=True)
+
+    assert shapes == [(*IMG_SIZE, 3), (IMG_SIZE[0] // 2, IMG_SIZE[1] // 2, 3)]
+    assert reduced["wms"] == pytest.approx(full["wms"])
+
+
+def test_get_stats_matches_find_closest_tree(tree_finder, wms_image, tmp_path):
+    for index in range(4):
+        cv2.imwrite(str(tmp_path / f"tree_{index}.png"), cv2.imread(wms_image))
+        (tmp_path / f"tree_{index}.json").write_text(
+            (tmp_path / "tree.json").read_text()
+        )
+
+    stats = tree_finder.get_stats([str(tmp_path)], ["wms"])
+    single = tree_finder.find_closest_tree(wms_image)[0]
+
+    assert stats["wms"] == pytest.approx([single] * 5)
+
+
+def test_get_stats_skips_missing_directory(tree_finder, wms_image, tmp_path):
+    stats = tree_finder.get_stats(
+        [str(tmp_path / "missing"), str(tmp_path)], ["static", "wms"]
+    )
+
+    assert stats["static"] == []
+    assert len(stats["wms"]) == 1
+
+
+def test_get_stats_as_array(tree_finder, wms_image, tmp_path):
+    stats = tree_finder.get_stats([str(tmp_path)], ["wms"], as_array=True)
+
+    assert stats["wms"].dtype == np.float32
+    assert stats["wms"] == pytest.approx(
+        tree_finder.get_stats([str(tmp_path)], ["wms"])["wms"]
+    )
+
+
+def test_model_is_shared_between_instances(monkeypatch):
+    loads = []
+
+    class LoadedModel(MockModel):
+        def eval(self):
+            return self
+
+    def load_from_checkpoint(checkpoint_path):
+        loads.append(checkpoint_path)
+        return LoadedModel()
+
+    monkeypatch.setattr(
+        TreeFinder, "_download_model_checkpoint", staticmethod(lambda: "model.ckpt")
+    )
+    monkeypatch.setattr(
+        tree_finder_module.main.deepforest,
+        "load_from_checkpoint",
+        load_from_checkpoint,
+    )
+    monkeypatch.setattr(tree_finder_module.torch.cuda, "is_available", lambda: False)
+    TreeFinder.reset_model()
+    try:
+        first, second = TreeFinder(), TreeFinder()
+        assert first.model is second.model
+        assert len(loads) == 1
+
+        TreeFinder.reset_model()
+        assert TreeFinder().model is not first.model
+        assert len(loads) == 2
+    finally:
+        TreeFinder.reset_model()
+
+
+def test_intact_checkpoint_is_hashed_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_checkpoint(tmp_path / "model_checkpoint.ckpt")
+    monkeypatch.setattr(tree_finder_module.kagglehub, "dataset_download", None)
+    hashed = []
+    file_digest = tree_finder_module.hashlib.file_digest
+
+    def counting_file_digest(f, digest):
+        hashed.append(f.name)
+        return file_digest(f, digest)
+
+    monkeypatch.setattr(tree_finder_module.hashlib, "file_digest", counting_file_digest)
+    for _ in range(3):
+        TreeFinder._download_model_checkpoint()
+
+    assert hashed == [str(tmp_path / "model_checkpoint.ckpt")]